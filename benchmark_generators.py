@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the image generation pipelines.
+
+Times every stage of the restaurant pipeline as restaurant_stages builds it
+(array and LUT engines), every per-hour render of the sky pipeline, and the
+real pipeline_variants / pipeline_hours runs (decode, render and encode over
+a few hours) on synthetic 1, 4 and 12 MP sources. Each timing is taken cold,
+with the generators' layer, LUT and sprite caches emptied before every run
+(the first hour of a fresh build), and warm, after a run that filled them
+(later hours and watch sessions). Results are written as JSON and can be
+compared against a stored baseline with a regression threshold.
+
+    python3 benchmark_generators.py --save benchmarks/baseline.json
+    python3 benchmark_generators.py --compare benchmarks/baseline.json --threshold 0.15
+"""
+
+from contextlib import redirect_stdout
+import argparse
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+
+import numpy as np
+import PIL
+from PIL import Image
+
+import generate_restaurant_variants as restaurant
+import generate_sky_images as sky
+
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+
+# Megapixels -> 16:9 source size
+SIZES = {
+    1: (1344, 756),
+    4: (2688, 1512),
+    12: (4608, 2592),
+}
+
+# Restaurant engines timed stage by stage ('reference' is minutes per hour)
+ENGINES = ('array', 'lut')
+
+# Module-level caches the generators fill as they render, emptied for cold timings
+CACHES = (
+    (restaurant, ('_layer_cache', '_lut_cache')),
+    (sky, ('_sprite_cache',)),
+)
+
+# Stage differences below this are treated as timer noise, not regressions
+NOISE_FLOOR = 0.002
+
+def synthetic_source(width, height, seed=0):
+    """Deterministic photo-like source: a smooth colour field with fine-grained noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    field = np.stack([
+        128 + 100 * np.sin(x / width * 3.1 + 0.5),
+        128 + 90 * np.cos(y / height * 2.7),
+        128 + 80 * np.sin((x + y) / (width + height) * 5.0),
+    ], axis=-1)
+    field += rng.normal(0, 12, field.shape).astype(np.float32)
+    return Image.fromarray(np.clip(field, 0, 255).astype(np.uint8), 'RGB')
+
+def clear_caches():
+    """Empty the generators' layer, LUT and sprite caches"""
+    for module, names in CACHES:
+        for name in names:
+            getattr(module, name).clear()
+
+def time_call(func, repeat, cold=False):
+    """
+    Best wall time of func() over repeat runs. Warm runs follow one untimed
+    run that fills the caches; cold runs start from empty caches every time.
+    Output printed by func is discarded.
+    """
+    with redirect_stdout(io.StringIO()):
+        if not cold:
+            result = func()
+        best = float('inf')
+        for _ in range(repeat):
+            if cold:
+                clear_caches()
+            started = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - started)
+    return best, result
+
+def time_cold_warm(timings, name, func, repeat):
+    """Record name/cold and name/warm timings of func(); returns its result"""
+    timings[f'{name}/cold'], _ = time_call(func, repeat, cold=True)
+    timings[f'{name}/warm'], result = time_call(func, repeat)
+    return result
+
+def encode_jpeg(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def bench_restaurant(source, hour, repeat):
+    """Per-stage timings of one restaurant hour through restaurant_stages, per engine, plus one encode"""
+    timings = {}
+    for engine in ENGINES:
+        img = source
+        with redirect_stdout(io.StringIO()):
+            stages = restaurant.restaurant_stages(*source.size, hour, engine=engine)
+        for name, _, stage in stages:
+            img = time_cold_warm(timings, f'{engine}/{name}', lambda: stage(img), repeat)
+    timings['encode'], _ = time_call(lambda: encode_jpeg(img, 92), repeat)
+    return timings
+
+def bench_sky(source, hours, repeat):
+    """Per-hour sky render timings, plus one encode"""
+    timings = {}
+    for hour in hours:
+        img = time_cold_warm(timings, f'hour-{hour:02d}', lambda: sky.render_sky_hour(source, hour)[0], repeat)
+    timings['encode'], _ = time_call(lambda: encode_jpeg(img, 90), repeat)
+    return timings
+
+def bench_pipelines(source, hours, repeat):
+    """Wall time of the generators' own pipelines over the hours, written to a scratch directory"""
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'source.jpg')
+        source.save(path, quality=95)
+        outputs = {hour: os.path.join(directory, f'restaurant-{hour:02d}.jpg') for hour in hours}
+        time_cold_warm(timings, 'restaurant', lambda: restaurant.pipeline_variants(path, outputs, hours), repeat)
+        time_cold_warm(timings, 'sky', lambda: sky.pipeline_hours(hours, path=path, directory=directory), repeat)
+    return timings
+
+def run(megapixels, repeat, restaurant_hour, sky_hours, pipeline_hours):
+    results = {}
+    for mp in megapixels:
+        width, height = SIZES[mp]
+        print(f"{mp} MP source ({width}x{height})")
+        source = synthetic_source(width, height)
+        for group, timings in (('restaurant', bench_restaurant(source, restaurant_hour, repeat)),
+                               ('sky', bench_sky(source, sky_hours, repeat)),
+                               ('pipeline', bench_pipelines(source, pipeline_hours, repeat))):
+            for stage, seconds in timings.items():
+                results[f'{group}/{mp}MP/{stage}'] = seconds
+                print(f"  {group:<10} {stage:<22} {seconds * 1000:9.1f} ms")
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pillow': PIL.__version__,
+        'numpy': np.__version__,
+    }
+
+def compare(results, baseline, threshold):
+    """Return [(name, baseline, current)] for timings slower than baseline by more than threshold"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current > previous * (1 + threshold) and current - previous > NOISE_FLOOR:
+            regressions.append((name, previous, current))
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the sky and restaurant image pipelines")
+    parser.add_argument('--sizes', default='1,4,12', help="comma-separated megapixel sizes (default: 1,4,12)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage, best is kept (default: 3)")
+    parser.add_argument('--hour', type=int, default=19, help="restaurant hour to benchmark (default: 19, has glow)")
+    parser.add_argument('--sky-hours', default='all', help="comma-separated sky hours or 'all' (default)")
+    parser.add_argument('--pipeline-hours', default='17,19,21',
+                        help="comma-separated hours for the full pipeline runs (default: 17,19,21)")
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--save', metavar='BASELINE', help="write results as the new baseline")
+    parser.add_argument('--compare', metavar='BASELINE', nargs='?', const=DEFAULT_BASELINE,
+                        help=f"compare against a baseline (default: {DEFAULT_BASELINE})")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="allowed slowdown before a stage counts as a regression (default: 0.15)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    megapixels = [int(mp) for mp in args.sizes.split(',')]
+    unknown = [mp for mp in megapixels if mp not in SIZES]
+    if unknown:
+        raise SystemExit(f"Unknown size(s) {unknown}; choose from {sorted(SIZES)}")
+    sky_hours = list(range(24)) if args.sky_hours == 'all' else [int(h) for h in args.sky_hours.split(',')]
+
+    pipeline_hours = [int(h) for h in args.pipeline_hours.split(',')]
+
+    results = run(megapixels, args.repeat, args.hour, sky_hours, pipeline_hours)
+    report = {'environment': environment(), 'results': results}
+
+    for path in filter(None, [args.output, args.save]):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Wrote {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != report['environment']:
+            print("Warning: baseline was recorded in a different environment")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for name, previous, current in regressions:
+                print(f"  {name}: {previous * 1000:.1f} ms -> {current * 1000:.1f} ms "
+                      f"({current / previous - 1:+.0%})")
+            raise SystemExit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.compare}")
+
+if __name__ == '__main__':
+    main()
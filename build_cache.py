@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Content-addressed incremental build cache for generated images.
+
+Each output is recorded in a JSON manifest together with a key hashed from
+everything that determines its pixels: the source image bytes, the hour's
+parameter tuple and the renderer version. An output is only re-rendered when
+its key changes or the file on disk no longer matches what was written.
+"""
+
+import hashlib
+import json
+import os
+
+DEFAULT_MANIFEST = '.build-cache.json'
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_key(*parts):
+    """Hash JSON-serializable inputs (tuples, dicts, strings, numbers) into a cache key"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=list)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _unchanged(path, digest):
+    return os.path.exists(path) and hash_file(path) == digest
+
+class BuildCache:
+    """Manifest of output path -> (input key, output hash), with hit/miss counters"""
+
+    def __init__(self, manifest_path=DEFAULT_MANIFEST, force=False):
+        self.manifest_path = manifest_path
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self.entries = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.entries = json.load(f).get('outputs', {})
+
+    def is_fresh(self, output_path, key):
+        """
+        True if output_path (and any extra files written with it) was built from
+        key and is unchanged on disk; counts a hit or miss
+        """
+        entry = self.entries.get(output_path)
+        fresh = (
+            not self.force
+            and entry is not None
+            and entry['key'] == key
+            and _unchanged(output_path, entry['output'])
+            and all(_unchanged(path, digest) for path, digest in entry.get('extras', {}).items())
+        )
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fresh
+
+    def record(self, output_path, key, generator, extras=()):
+        """Remember that output_path (plus extra derived files) was just written from key"""
+        self.entries[output_path] = {
+            'key': key,
+            'generator': generator,
+            'output': hash_file(output_path),
+        }
+        if extras:
+            self.entries[output_path]['extras'] = {path: hash_file(path) for path in extras}
+
+    def save(self):
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'outputs': self.entries}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    def summary(self):
+        total = self.hits + self.misses
+        return f"Build cache: {self.hits}/{total} up to date, {self.misses} re-rendered"
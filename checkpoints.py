@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+On-disk checkpoints of render-graph intermediates.
+
+A render graph node's key is its stage name, parameters and the keys of its
+inputs, so it identifies the node's output across runs once the source is
+keyed by its bytes (render_graph.py adds the stages' code). After the chosen
+stages each intermediate is written as a raw .npy array; a later run that
+reaches a node with a checkpoint maps the file instead of decoding it and skips
+every stage before it. The stages downstream work on RGB images, so a restore
+still reads the whole file and repacks it to RGB: one copy, no decode. Tweaking a late stage's parameters therefore re-runs
+only the stages after the last unchanged checkpoint.
+
+Checkpoints are kept in RGBX, the layout Pillow can map without copying, and
+the least recently used ones are evicted beyond a size cap. A node that took
+less time to compute than it would take to load, read and repack included, is
+not written at all.
+"""
+
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from build_cache import build_key
+
+CHECKPOINT_DIR = '.checkpoints'
+CHECKPOINT_LIMIT_MB = 1024
+# Assumed checkpoint read rate (a cold read from disk, before the repack to RGB)
+# until loads have been timed
+CHECKPOINT_READ_MB_PER_S = 400
+
+class CheckpointStore:
+    """Checkpoints for the nodes of the named stages, namespaced by generator and renderer version"""
+
+    def __init__(self, stages, namespace, directory=CHECKPOINT_DIR, limit_mb=CHECKPOINT_LIMIT_MB):
+        self.stages = set(stages)
+        self.namespace = namespace
+        self.directory = directory
+        self.limit = limit_mb * 2**20
+        self.loaded = 0
+        self.saved = 0
+        self.skipped = 0
+        self.evicted = 0
+        self.load_bytes = 0
+        self.load_seconds = 0.0
+        if os.path.isdir(directory):
+            self.evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, build_key(self.namespace, key) + '.npy')
+
+    def load(self, key):
+        """RGB image checkpointed for a node key, repacked from the mapped file, or None"""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        started = time.perf_counter()
+        pixels = np.load(path, mmap_mode='r')
+        # Mark it recently used for eviction
+        os.utime(path)
+        self.loaded += 1
+        height, width = pixels.shape[:2]
+        rgbx = Image.frombuffer('RGBX', (width, height), pixels, 'raw', 'RGBX', 0, 1)
+        img = rgbx.convert('RGB')
+        self.load_bytes += pixels.nbytes
+        self.load_seconds += time.perf_counter() - started
+        return img
+
+    def load_cost(self, size, repack):
+        """
+        Estimated seconds to load a checkpoint of size pixels: the timed load
+        rate, or before any load the assumed read rate plus repack, the measured
+        seconds of the RGB <-> RGBX conversion
+        """
+        nbytes = size[0] * size[1] * 4
+        if self.load_seconds:
+            return nbytes * self.load_seconds / self.load_bytes
+        return nbytes / (CHECKPOINT_READ_MB_PER_S * 2**20) + repack
+
+    def save(self, key, img, cost=None):
+        """Checkpoint img, unless it took cost seconds (if given) or less than loading it would"""
+        started = time.perf_counter()
+        rgbx = img.convert('RGBX')
+        if cost is not None and cost <= self.load_cost(img.size, time.perf_counter() - started):
+            self.skipped += 1
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        partial = path + '.partial'
+        with open(partial, 'wb') as f:
+            np.save(f, np.asarray(rgbx))
+        os.replace(partial, path)
+        self.saved += 1
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used checkpoints until the directory fits the size cap"""
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.npy'):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.limit:
+                break
+            os.remove(path)
+            total -= size
+            self.evicted += 1
+
+    def summary(self):
+        return (f"Checkpoints: {self.loaded} restored, {self.saved} written, {self.skipped} skipped as cheaper "
+                f"to recompute than to load, {self.evicted} evicted "
+                f"(cap {self.limit / 2**20:.0f} MB in {self.directory}/)")
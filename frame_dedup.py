@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Perceptual deduplication of rendered hour frames.
+
+Several hours render to frames that are practically the same picture (the
+night hours share their lighting adjustment and star field and differ only in
+where the moon is). The moving element scores far below any useful SSIM
+threshold on its own, so frames are compared by a view of them without it
+(for the sky, the hour's lighting on the background before the sky elements)
+together with the elements that must match exactly (the sun and star field).
+Each view gets a 64-bit difference hash; a frame whose fixed elements equal an
+earlier frame's, whose hash is within a few bits of that frame's and whose luma
+SSIM against it clears the threshold is not encoded.
+Its file is hard-linked to the earlier (canonical) frame and
+images/sky/aliases.json maps the hour to the canonical one, so SkyTimeLapse
+fetches the shared image only once.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from PIL import Image
+
+from targeted_encoding import KB, ssim
+
+ALIASES_PATH = 'images/sky/aliases.json'
+
+HASH_SIZE = 8
+# Hash bits two frames may differ in before SSIM is even computed
+MAX_HASH_DISTANCE = 6
+# Luma SSIM a frame's view needs against the canonical frame's to be treated as a
+# duplicate, measured at SSIM_WIDTH (a quarter of a 1920px frame, over 10x faster
+# than full size). Sky views of hours sharing a lighting keyframe score 1.0; the
+# closest distinct lighting (23:00 against 00:00) scores about 0.93
+DEDUP_MIN_SSIM = 0.995
+SSIM_WIDTH = 480
+
+def dhash(img, size=HASH_SIZE):
+    """Difference hash: sign of each horizontal gradient of a size x size grayscale thumbnail"""
+    small = np.asarray(img.convert('L').resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+def ssim_luma(img, width=SSIM_WIDTH):
+    """uint8 luma of img, box-downscaled to at most width for the SSIM check"""
+    gray = img.convert('L')
+    if gray.width > width:
+        gray = gray.resize((width, max(1, round(gray.height * width / gray.width))), Image.BOX)
+    return np.asarray(gray)
+
+def hash_distance(a, b):
+    return bin(a ^ b).count('1')
+
+def link_frame(canonical_path, path):
+    """Make path the same file as canonical_path (a copy where hard links are unsupported)"""
+    if os.path.exists(path):
+        os.remove(path)
+    try:
+        os.link(canonical_path, path)
+    except OSError:
+        shutil.copyfile(canonical_path, path)
+
+class FrameDeduplicator:
+    """Matches frames against the canonical frames seen so far in one batch"""
+
+    def __init__(self, min_ssim=DEDUP_MIN_SSIM, max_distance=MAX_HASH_DISTANCE):
+        self.min_ssim = min_ssim
+        self.max_distance = max_distance
+        self.frames = []
+        self.aliases = {}
+        self.check_time = 0.0
+        self.encodes = {}
+
+    def match(self, name, img, fixed=None):
+        """
+        Canonical name of an earlier frame img duplicates, or None (img becomes
+        canonical). img is the frame's comparison view; fixed (any comparable
+        value) describes what must be identical for a match.
+        """
+        started = time.perf_counter()
+        frame_hash = dhash(img)
+        frame_luma = ssim_luma(img)
+        # Only earlier frames within the hash distance get the (much slower) SSIM
+        # check, nearest first
+        candidates = [(hash_distance(frame_hash, other_hash), index)
+                      for index, (_, other_hash, other_luma, other_fixed) in enumerate(self.frames)
+                      if other_fixed == fixed and other_luma.shape == frame_luma.shape]
+        canonical = None
+        for distance, index in sorted(candidates):
+            other, _, other_luma, _ = self.frames[index]
+            if distance > self.max_distance:
+                break
+            if ssim(frame_luma.astype(np.float64), other_luma.astype(np.float64)) >= self.min_ssim:
+                canonical = other
+                break
+        if canonical is None:
+            self.frames.append((name, frame_hash, frame_luma, fixed))
+        else:
+            self.aliases[name] = canonical
+        self.check_time += time.perf_counter() - started
+        return canonical
+
+    def record_encode(self, name, seconds, path):
+        """Remember what writing a canonical frame cost, to report what its aliases saved"""
+        self.encodes[name] = (seconds, os.path.getsize(path))
+
+    def summary(self):
+        if not self.aliases:
+            return f"Deduplication: no duplicate frames ({self.check_time * 1000:.0f} ms of checks)"
+        seconds = sum(self.encodes[canonical][0] for canonical in self.aliases.values())
+        size = sum(self.encodes[canonical][1] for canonical in self.aliases.values())
+        pairs = ', '.join(f'{name}→{canonical}' for name, canonical in sorted(self.aliases.items()))
+        return (f"Deduplication: {len(self.aliases)} of {len(self.aliases) + len(self.frames)} frames alias an "
+                f"earlier one ({pairs}); {seconds * 1000:.0f} ms of encoding skipped, {size / KB:.0f} KB not "
+                f"shipped, {self.check_time * 1000:.0f} ms of checks")
+
+def update_aliases(aliases, rendered, manifest_path=ALIASES_PATH):
+    """
+    Merge {alias name: canonical name} into the manifest, first dropping every
+    alias from or to a freshly rendered name (its file was just rewritten).
+    """
+    if not aliases and not os.path.exists(manifest_path):
+        return {}
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    rendered = set(rendered)
+    manifest = {name: canonical for name, canonical in manifest.items()
+                if name not in rendered and canonical not in rendered}
+    manifest.update(aliases)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
@@ -3,94 +3,83 @@
 Generate realistic sky images for each hour (00-23)
 Overlaying time-of-day lighting effects on the background image
 with sun and moon moving through the sky
+
+Importing the module has no side effects and does not load Pillow, numpy or
+the tracing and pipeline machinery until an image is rendered, so tools that
+only read the parameter tables start fast. render_hour() and render_hours() render from any PIL image and return
+the frames in memory; main() is the command-line wrapper that writes the site's
+images/sky/HH.jpg files.
 """
 
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
+import argparse
 import os
 import math
+import time
+
+from build_cache import BuildCache, build_key, hash_file
+from keyframes import interpolate_keyframes
+from tiling import MB, OffsetDraw, blur_halo, iter_strips, strip_width
+
+# Bump whenever a change to the rendering code alters output pixels
+RENDERER_VERSION = 1
 
-# Create sky directory if it doesn't exist
 sky_dir = "images/sky"
-os.makedirs(sky_dir, exist_ok=True)
+background_path = "images/rich-main.jpg"
+PREVIEW_PATH = 'preview-sky.jpg'
+HOURS = range(24)
+JPEG_QUALITY = 90
 
-# Define color schemes for different times of day
-def get_sky_colors(hour):
-    """Return top, middle, and bottom colors for sky gradient based on hour"""
-    
+# Sky colour keyframes (top, middle, bottom) for each hour; other times of day
+# are interpolated between neighbouring hours
+SKY_COLORS = {
     # Night (0-4): Deep starry night
-    if hour == 0:
-        return ((5, 10, 30), (10, 15, 40), (15, 20, 45))
-    elif hour == 1:
-        return ((8, 12, 32), (12, 18, 42), (16, 22, 47))
-    elif hour == 2:
-        return ((10, 14, 34), (14, 20, 44), (18, 24, 49))
-    elif hour == 3:
-        return ((12, 16, 36), (16, 22, 46), (20, 26, 51))
-    elif hour == 4:
-        return ((15, 20, 40), (20, 28, 50), (25, 32, 55))
-    
+    0: ((5, 10, 30), (10, 15, 40), (15, 20, 45)),
+    1: ((8, 12, 32), (12, 18, 42), (16, 22, 47)),
+    2: ((10, 14, 34), (14, 20, 44), (18, 24, 49)),
+    3: ((12, 16, 36), (16, 22, 46), (20, 26, 51)),
+    4: ((15, 20, 40), (20, 28, 50), (25, 32, 55)),
     # Dawn/Pre-sunrise (5): First light
-    elif hour == 5:
-        return ((30, 35, 70), (80, 60, 100), (120, 80, 110))
-    
+    5: ((30, 35, 70), (80, 60, 100), (120, 80, 110)),
     # Sunrise (6): Golden sunrise
-    elif hour == 6:
-        return ((255, 180, 120), (255, 140, 90), (255, 100, 70))
-    
+    6: ((255, 180, 120), (255, 140, 90), (255, 100, 70)),
     # Early morning (7): Warm morning light
-    elif hour == 7:
-        return ((135, 180, 230), (200, 160, 140), (255, 190, 150))
-    
+    7: ((135, 180, 230), (200, 160, 140), (255, 190, 150)),
     # Morning (8): Clear morning
-    elif hour == 8:
-        return ((100, 160, 230), (130, 180, 235), (160, 200, 240))
-    
+    8: ((100, 160, 230), (130, 180, 235), (160, 200, 240)),
     # Mid-morning (9): Bright morning
-    elif hour == 9:
-        return ((90, 150, 225), (120, 180, 235), (150, 200, 245))
-    
+    9: ((90, 150, 225), (120, 180, 235), (150, 200, 245)),
     # Late morning (10-11): Beautiful blue sky
-    elif hour in [10, 11]:
-        return ((70, 130, 225), (100, 160, 235), (135, 190, 250))
-    
+    10: ((70, 130, 225), (100, 160, 235), (135, 190, 250)),
+    11: ((70, 130, 225), (100, 160, 235), (135, 190, 250)),
     # Noon-Early afternoon (12-14): Peak sun
-    elif hour in [12, 13, 14]:
-        return ((60, 120, 220), (90, 150, 230), (120, 180, 245))
-    
+    12: ((60, 120, 220), (90, 150, 230), (120, 180, 245)),
+    13: ((60, 120, 220), (90, 150, 230), (120, 180, 245)),
+    14: ((60, 120, 220), (90, 150, 230), (120, 180, 245)),
     # Mid-afternoon (15): Still bright
-    elif hour == 15:
-        return ((80, 140, 220), (110, 170, 235), (140, 195, 248))
-    
+    15: ((80, 140, 220), (110, 170, 235), (140, 195, 248)),
     # Late afternoon (16): Starting to warm
-    elif hour == 16:
-        return ((100, 150, 215), (150, 175, 220), (200, 185, 200))
-    
+    16: ((100, 150, 215), (150, 175, 220), (200, 185, 200)),
     # Golden hour (17): Beautiful golden light
-    elif hour == 17:
-        return ((120, 160, 210), (240, 180, 140), (255, 160, 100))
-    
+    17: ((120, 160, 210), (240, 180, 140), (255, 160, 100)),
     # Sunset (18): Spectacular sunset
-    elif hour == 18:
-        return ((255, 160, 100), (255, 120, 90), (250, 90, 120))
-    
+    18: ((255, 160, 100), (255, 120, 90), (250, 90, 120)),
     # Post-sunset/Dusk (19): Purple hour
-    elif hour == 19:
-        return ((120, 80, 140), (90, 60, 110), (60, 40, 90))
-    
+    19: ((120, 80, 140), (90, 60, 110), (60, 40, 90)),
     # Evening twilight (20): Deep twilight
-    elif hour == 20:
-        return ((50, 45, 90), (35, 35, 70), (25, 25, 55))
-    
+    20: ((50, 45, 90), (35, 35, 70), (25, 25, 55)),
     # Night (21-23): Deep night
-    elif hour == 21:
-        return ((20, 25, 60), (15, 20, 50), (12, 16, 42))
-    elif hour == 22:
-        return ((12, 18, 50), (10, 15, 42), (8, 12, 36))
-    else:  # 23
-        return ((8, 12, 40), (7, 10, 35), (6, 8, 32))
+    21: ((20, 25, 60), (15, 20, 50), (12, 16, 42)),
+    22: ((12, 18, 50), (10, 15, 42), (8, 12, 36)),
+    23: ((8, 12, 40), (7, 10, 35), (6, 8, 32)),
+}
+
+def get_sky_colors(hour):
+    """Return top, middle, and bottom colors for sky gradient at any (possibly fractional) hour"""
+    return interpolate_keyframes(SKY_COLORS, hour)
 
 def get_sun_position(hour):
     """Calculate sun position based on hour (returns None if sun is not visible)"""
+    hour %= 24
     if hour < 6 or hour > 19:
         return None
     
@@ -107,15 +96,16 @@ def get_sun_position(hour):
 
 def get_moon_position(hour):
     """Calculate moon position based on hour (returns None if moon is not visible)"""
+    hour %= 24
     if 6 <= hour <= 18:
         return None
     
-    # Moon visible from 19 to 5
+    # Moon visible from 19 to 5, rising from below the arc's start after 18
     # Adjust hour for calculation
-    if hour >= 19:
-        moon_hour = hour - 19  # 0-5 for 19-23
+    if hour > 18:
+        moon_hour = hour - 19  # -1-5 for 18-24
     else:
-        moon_hour = hour + 5  # 5-10 for 0-5
+        moon_hour = hour + 5  # 5-11 for 0-6
     
     progress = moon_hour / 11.0
     angle = math.pi * progress
@@ -125,21 +115,20 @@ def get_moon_position(hour):
     
     return (x, y)
 
-def draw_sun(draw, width, height, position, hour):
-    """Draw the sun at given position"""
-    x = int(width * position[0])
-    y = int(height * position[1])
-    
-    # Vary sun size and intensity by time
-    if hour == 6:
+def get_sun_style(hour):
+    """Sun (radius, color, glow) for the (possibly fractional) hour"""
+    hour %= 24
+    # Vary sun size and intensity by time; half-open ranges, so a fractional
+    # hour keeps the style of the whole hour it falls in
+    if 6 <= hour < 7:
         radius = 40
         color = (255, 200, 100)
         glow = (255, 180, 80, 100)
-    elif hour == 18:
+    elif 18 <= hour < 19:
         radius = 45
         color = (255, 150, 80)
         glow = (255, 120, 60, 120)
-    elif 12 <= hour <= 15:
+    elif 12 <= hour < 16:
         radius = 50
         color = (255, 240, 200)
         glow = (255, 250, 220, 80)
@@ -147,6 +136,17 @@ def draw_sun(draw, width, height, position, hour):
         radius = 45
         color = (255, 230, 180)
         glow = (255, 220, 160, 90)
+    return radius, color, glow
+
+def draw_sun(draw, width, height, position, hour):
+    """Draw the sun at given position"""
+    x = int(width * position[0])
+    y = int(height * position[1])
+    draw_sun_at(draw, x, y, get_sun_style(hour))
+
+def draw_sun_at(draw, x, y, style):
+    """Draw a sun of the given style centred on pixel (x, y)"""
+    radius, color, glow = style
     
     # Draw glow
     for i in range(4, 0, -1):
@@ -166,6 +166,10 @@ def draw_moon(draw, width, height, position, hour):
     """Draw the moon at given position"""
     x = int(width * position[0])
     y = int(height * position[1])
+    draw_moon_at(draw, x, y)
+
+def draw_moon_at(draw, x, y):
+    """Draw the moon centred on pixel (x, y)"""
     radius = 35
     
     # Moon color - slightly warm white
@@ -192,18 +196,24 @@ def draw_moon(draw, width, height, position, hour):
     draw.ellipse([x + 5, y - 12, x + 12, y - 5], fill=crater_color)
     draw.ellipse([x - 5, y + 5, x + 2, y + 12], fill=crater_color)
 
-def draw_stars(draw, width, height, hour, num_stars=150):
-    """Draw stars for night sky"""
+def get_star_style(hour):
+    """(number of stars, opacity) for the (possibly fractional) hour, or None when no stars are visible"""
+    hour %= 24
     if 6 <= hour <= 18:
-        return
+        return None
     
     # More stars visible during deepest night
-    if 0 <= hour <= 4 or 21 <= hour <= 23:
-        opacity = 255
-        num_stars = 200
-    else:  # Twilight hours
-        opacity = 100
-        num_stars = 80
+    if hour < 5 or hour >= 21:
+        return 200, 255
+    # Twilight hours
+    return 80, 100
+
+def draw_stars(draw, width, height, hour, num_stars=150):
+    """Draw stars for night sky"""
+    style = get_star_style(hour)
+    if style is None:
+        return
+    num_stars, opacity = style
     
     import random
     random.seed(42)  # Consistent star positions
@@ -217,111 +227,157 @@ def draw_stars(draw, width, height, hour, num_stars=150):
         color = (brightness, brightness, brightness, opacity)
         draw.ellipse([x, y, x + size, y + size], fill=color)
 
-def get_lighting_adjustment(hour):
-    """Return brightness and color tint adjustments for the hour"""
-    # Returns (brightness_factor, color_overlay_rgb, overlay_opacity)
-    
+# Star fields and sun/moon sprites are drawn once and reused by every hour
+_sprite_cache = {}
+
+def _sprite(key, draw_at, extent):
+    """
+    Cached (sprite, dx, dy): whatever draw_at(draw, x, y) paints around a centre
+    pixel, cropped to its bounding box, with the box's offset from that centre
+    """
+    if key not in _sprite_cache:
+        from PIL import Image, ImageDraw
+        size = 2 * extent + 3
+        canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        draw_at(ImageDraw.Draw(canvas, 'RGBA'), extent + 1, extent + 1)
+        box = canvas.getbbox(alpha_only=False)
+        _sprite_cache[key] = (canvas.crop(box), box[0] - extent - 1, box[1] - extent - 1)
+    return _sprite_cache[key]
+
+def get_sun_sprite(style):
+    radius = style[0]
+    return _sprite(('sun', style), lambda draw, x, y: draw_sun_at(draw, x, y, style), radius + 80)
+
+def get_moon_sprite():
+    return _sprite(('moon',), draw_moon_at, 35 + 45)
+
+def get_star_field(width, height, hour):
+    """Cached (sprite, x, y) of the hour's star field cropped to its stars, or None"""
+    style = get_star_style(hour)
+    if style is None:
+        return None
+    key = ('stars', width, height, style)
+    if key not in _sprite_cache:
+        from PIL import Image, ImageDraw
+        layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        draw_stars(ImageDraw.Draw(layer, 'RGBA'), width, height, hour)
+        box = layer.getbbox(alpha_only=False)
+        _sprite_cache[key] = (layer.crop(box), box[0], box[1])
+    return _sprite_cache[key]
+
+def build_sky_layer(width, height, hour, left=0, right=None):
+    """
+    The hour's stars, sun and moon for columns left:right, on the smallest region
+    that holds them. Returns (layer, x, y) in full-image coordinates, or None.
+    Sprites are pasted where the region is still empty; where one would land on
+    an earlier element its ellipses are redrawn instead, exactly as on a full layer.
+    """
+    from PIL import Image, ImageDraw
+    right = width if right is None else right
+    placements = []
+    stars = get_star_field(width, height, hour)
+    if stars:
+        placements.append(stars + (None,))
+    sun_pos = get_sun_position(hour)
+    if sun_pos:
+        x, y = int(width * sun_pos[0]), int(height * sun_pos[1])
+        style = get_sun_style(hour)
+        sprite, dx, dy = get_sun_sprite(style)
+        placements.append((sprite, x + dx, y + dy, lambda draw, x=x, y=y: draw_sun_at(draw, x, y, style)))
+    moon_pos = get_moon_position(hour)
+    if moon_pos:
+        x, y = int(width * moon_pos[0]), int(height * moon_pos[1])
+        sprite, dx, dy = get_moon_sprite()
+        placements.append((sprite, x + dx, y + dy, lambda draw, x=x, y=y: draw_moon_at(draw, x, y)))
+    
+    # Clip every placement to the canvas columns being rendered
+    boxes = []
+    for sprite, x, y, redraw in placements:
+        box = (max(x, left), max(y, 0), min(x + sprite.width, right), min(y + sprite.height, height))
+        if box[0] < box[2] and box[1] < box[3]:
+            boxes.append((box, sprite, x, y, redraw))
+    if not boxes:
+        return None
+    x0 = min(box[0] for box, *_ in boxes)
+    y0 = min(box[1] for box, *_ in boxes)
+    x1 = max(box[2] for box, *_ in boxes)
+    y1 = max(box[3] for box, *_ in boxes)
+    
+    layer = Image.new('RGBA', (x1 - x0, y1 - y0), (0, 0, 0, 0))
+    for (bx0, by0, bx1, by1), sprite, x, y, redraw in boxes:
+        target = (bx0 - x0, by0 - y0, bx1 - x0, by1 - y0)
+        if redraw is None or layer.crop(target).getbbox(alpha_only=False) is None:
+            layer.paste(sprite.crop((bx0 - x, by0 - y, bx1 - x, by1 - y)), target[:2])
+        else:
+            redraw(OffsetDraw(ImageDraw.Draw(layer, 'RGBA'), x0, y0))
+    return layer, x0, y0
+
+# Lighting keyframes: (brightness_factor, color_overlay_rgb, overlay_opacity)
+LIGHTING_ADJUSTMENTS = {
     # Night (0-4): Dark with blue tint
-    if hour in [0, 1, 2, 3, 4]:
-        return (0.15, (5, 15, 40), 0.7)
-    
+    **{hour: (0.15, (5, 15, 40), 0.7) for hour in range(0, 5)},
     # Dawn (5): Starting to lighten, purple-blue tint
-    elif hour == 5:
-        return (0.35, (40, 50, 90), 0.6)
-    
+    5: (0.35, (40, 50, 90), 0.6),
     # Sunrise (6): Golden warm glow
-    elif hour == 6:
-        return (0.75, (255, 180, 120), 0.4)
-    
+    6: (0.75, (255, 180, 120), 0.4),
     # Early morning (7): Warm light
-    elif hour == 7:
-        return (0.9, (255, 230, 200), 0.25)
-    
+    7: (0.9, (255, 230, 200), 0.25),
     # Morning to afternoon (8-15): Full brightness, minimal tint
-    elif 8 <= hour <= 15:
-        return (1.0, (255, 255, 250), 0.1)
-    
+    **{hour: (1.0, (255, 255, 250), 0.1) for hour in range(8, 16)},
     # Late afternoon (16): Slight warm tint
-    elif hour == 16:
-        return (0.95, (255, 240, 220), 0.15)
-    
+    16: (0.95, (255, 240, 220), 0.15),
     # Golden hour (17): Beautiful golden light
-    elif hour == 17:
-        return (0.85, (255, 200, 140), 0.35)
-    
+    17: (0.85, (255, 200, 140), 0.35),
     # Sunset (18): Rich warm colors
-    elif hour == 18:
-        return (0.65, (255, 140, 100), 0.5)
-    
+    18: (0.65, (255, 140, 100), 0.5),
     # Dusk (19): Purple hour
-    elif hour == 19:
-        return (0.4, (120, 80, 140), 0.6)
-    
+    19: (0.4, (120, 80, 140), 0.6),
     # Evening (20-23): Deep blue night
-    else:
-        return (0.2, (15, 20, 50), 0.7)
+    **{hour: (0.2, (15, 20, 50), 0.7) for hour in range(20, 24)},
+}
 
-# Load the background image
-background_path = "images/rich-main.jpg"
-if not os.path.exists(background_path):
-    print(f"Error: Background image not found at {background_path}")
-    print("Please ensure rich-main.jpg exists in the images/ directory")
-    exit(1)
+def get_lighting_adjustment(hour):
+    """Return brightness and color tint adjustments for any (possibly fractional) hour"""
+    # Returns (brightness_factor, color_overlay_rgb, overlay_opacity)
+    return interpolate_keyframes(LIGHTING_ADJUSTMENTS, hour)
 
-base_img = Image.open(background_path)
-width, height = base_img.size
-print(f"Loaded background image: {width}x{height}")
+# Radius of the finishing blur, the columns it reads beyond each strip, and the
+# peak bytes per strip pixel (RGBA copies, overlay, sky layer, RGB and blur)
+BLUR_RADIUS = 0.5
+BLUR_HALO = blur_halo(BLUR_RADIUS)
+STRIP_BYTES_PER_PIXEL = 24
 
-# Generate images
-for hour in range(24):
-    hour_str = str(hour).zfill(2)
-    
-    # Start with a copy of the background image
-    img = base_img.copy().convert('RGBA')
-    
-    # Get lighting adjustments for this hour
-    brightness, tint_color, tint_opacity = get_lighting_adjustment(hour)
-    
-    # Adjust brightness
-    enhancer = ImageEnhance.Brightness(img)
-    img = enhancer.enhance(brightness)
-    
-    # Create color overlay layer
-    overlay = Image.new('RGBA', (width, height), tint_color + (int(255 * tint_opacity),))
-    
-    # Blend the overlay with the image
-    img = Image.alpha_composite(img, overlay)
-    
-    # Create a transparent layer for sky elements (sun/moon/stars)
-    sky_layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(sky_layer, 'RGBA')
-    
-    # Add stars for night hours
-    draw_stars(draw, width, height, hour)
+def sky_strip_width(width, height, max_memory):
+    """Strip width that keeps a width x height render within max_memory bytes"""
+    # Background and output at full size
+    return strip_width(width, height, max_memory, 2 * 3 * width * height, STRIP_BYTES_PER_PIXEL, BLUR_HALO)
+
+def render_sky_hour(base_img, hour, max_memory=None, strip=None):
+    """
+    Render one hour over the background; returns (image, brightness, elements).
+    With max_memory (bytes) or a strip width the image is rendered in column
+    strips widened by the blur halo, which gives the same pixels as a whole render.
+    """
+    from PIL import Image
+    width, height = base_img.size
+    brightness = get_lighting_adjustment(hour)[0]
+    if max_memory and strip is None:
+        strip = sky_strip_width(width, height, max_memory)
+    
+    if strip is None:
+        img_rgb = render_sky_columns(base_img, hour, 0, width)
+    else:
+        img_rgb = Image.new('RGB', base_img.size)
+        for x0, x1, left, right in iter_strips(width, strip, BLUR_HALO):
+            region = render_sky_columns(base_img, hour, left, right)
+            img_rgb.paste(region.crop((x0 - left, 0, x1 - left, height)), (x0, 0))
     
-    # Add sun if visible
+    return img_rgb, brightness, get_visible_elements(hour)
+
+def get_visible_elements(hour):
+    """Names of the sky elements shown at the hour"""
     sun_pos = get_sun_position(hour)
-    if sun_pos:
-        draw_sun(draw, width, height, sun_pos, hour)
-    
-    # Add moon if visible
     moon_pos = get_moon_position(hour)
-    if moon_pos:
-        draw_moon(draw, width, height, moon_pos, hour)
-    
-    # Composite sky elements onto the image
-    img = Image.alpha_composite(img, sky_layer)
-    
-    # Convert to RGB for JPEG
-    img_rgb = img.convert('RGB')
-    
-    # Apply slight blur for more natural look
-    img_rgb = img_rgb.filter(ImageFilter.GaussianBlur(radius=0.5))
-    
-    # Save image
-    output_path = os.path.join(sky_dir, f"{hour_str}.jpg")
-    img_rgb.save(output_path, 'JPEG', quality=90, optimize=True)
-    
     elements = []
     if sun_pos:
         elements.append('Sun')
@@ -329,9 +385,561 @@ for hour in range(24):
         elements.append('Moon')
     if not sun_pos and not moon_pos:
         elements.append('Stars')
+    return elements
+
+def sky_element_key(width, height, hour):
+    """Everything build_sky_layer draws for the hour: star style and sun/moon placement"""
+    sun_pos = get_sun_position(hour)
+    moon_pos = get_moon_position(hour)
+    sun = (int(width * sun_pos[0]), int(height * sun_pos[1]), get_sun_style(hour)) if sun_pos else None
+    moon = (int(width * moon_pos[0]), int(height * moon_pos[1])) if moon_pos else None
+    return get_star_style(hour), sun, moon
+
+def get_proxy_sky_layer(full_width, full_height, hour, size):
+    """The hour's full-size stars, sun and moon box-filtered down to a preview proxy's size, or None"""
+    key = ('proxy', full_width, full_height, size, sky_element_key(full_width, full_height, hour))
+    if key not in _sprite_cache:
+        from PIL import Image
+        sky_layer = build_sky_layer(full_width, full_height, hour)
+        if sky_layer is None:
+            _sprite_cache[key] = None
+        else:
+            layer, x, y = sky_layer
+            # Premultiplied, so transparent pixels don't darken the edges
+            canvas = Image.new('RGBa', (full_width, full_height))
+            canvas.paste(layer.convert('RGBa'), (x, y))
+            _sprite_cache[key] = canvas.resize(size, Image.BOX).convert('RGBA')
+    return _sprite_cache[key]
+
+def sky_stages(width, height, hour, left, right, full_size=None):
+    """
+    One hour's pipeline for columns left:right as (name, params, func) stages.
+    Each func is a pure Image -> Image step (the first takes the background) and
+    params identify its output given its input, so render graphs can share it.
+    With full_size, width x height is a preview proxy of a background that size:
+    the sky elements are drawn at full size and shrunk, and the blur scaled.
+    """
+    from PIL import Image, ImageEnhance, ImageFilter
+    # Get lighting adjustments for this hour
+    brightness, tint_color, tint_opacity = get_lighting_adjustment(hour)
+    # Interpolated tints are fractional; keyframe tints are already ints
+    tint_color = tuple(int(round(channel)) for channel in tint_color)
     
-    print(f"Generated {output_path} - Brightness: {brightness:.2f}, {', '.join(elements)}")
+    def brighten(base_img):
+        # Start with a copy of the background image
+        img = base_img.crop((left, 0, right, height)).convert('RGBA')
+        
+        # Adjust brightness
+        enhancer = ImageEnhance.Brightness(img)
+        return enhancer.enhance(brightness)
+    
+    def tint(img):
+        # Create color overlay layer and blend it with the image
+        overlay = Image.new('RGBA', img.size, tint_color + (int(255 * tint_opacity),))
+        return Image.alpha_composite(img, overlay)
+    
+    blur_radius = BLUR_RADIUS * width / full_size[0] if full_size else BLUR_RADIUS
+    
+    def add_elements(img):
+        if full_size:
+            layer = get_proxy_sky_layer(*full_size, hour, img.size)
+            if layer:
+                img = img.copy()
+                img.alpha_composite(layer)
+            return img
+        # Stars, sun and moon from cached sprites, composited once over the
+        # region they cover (fully transparent layer pixels leave the image as is)
+        sky_layer = build_sky_layer(width, height, hour, left, right)
+        if sky_layer:
+            layer, x, y = sky_layer
+            img = img.copy()
+            img.alpha_composite(layer, dest=(x - left, y))
+        return img
+    
+    def blur(img):
+        # Convert to RGB for JPEG, with a slight blur for a more natural look
+        return img.convert('RGB').filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    
+    return [
+        ('brightness', (left, right, brightness), brighten),
+        ('tint', (tint_color, tint_opacity), tint),
+        ('sky_elements', sky_element_key(*(full_size or (width, height)), hour), add_elements),
+        ('blur', (blur_radius,), blur),
+    ]
+
+def render_sky_columns(base_img, hour, left, right):
+    """Render columns left:right of one hour; pixels within the blur halo of a cut edge are not final"""
+    from tracing import trace_stage
+    img = base_img
+    for name, _, stage in sky_stages(*base_img.size, hour, left, right):
+        with trace_stage(name, hour=hour):
+            img = stage(img)
+    return img
+
+def add_sky_hour(graph, source, width, height, hour, full_size=None):
+    """Add one hour's whole-image pipeline to a render graph; returns its output node"""
+    return graph.chain(source, sky_stages(width, height, hour, 0, width, full_size))
+
+def get_output_path(hour, directory=sky_dir):
+    return os.path.join(directory, f"{str(hour).zfill(2)}.jpg")
+
+def sky_cache_key(source_hash, hour, responsive=False, encoding=None, dedup=None, quality=JPEG_QUALITY):
+    """Build-cache key for one hour: source bytes, parameter tuple, encoder settings and renderer version"""
+    exports = None
+    if responsive:
+        from responsive_export import EXPORT_WIDTHS, available_formats
+        exports = [EXPORT_WIDTHS, available_formats()]
+    parts = ['sky', RENDERER_VERSION, source_hash, hour, get_lighting_adjustment(hour), get_sky_colors(hour),
+             exports, encoding]
+    # A deduplicated hour may hold its canonical hour's frame
+    if dedup:
+        parts.append(['dedup', dedup])
+    if quality != JPEG_QUALITY:
+        parts.append(['quality', quality])
+    return build_key(*parts)
+
+def save_sky_hour(base_img, hour, responsive=False, max_memory=None, encoding=None, directory=sky_dir,
+                  quality=JPEG_QUALITY):
+    """
+    Render one hour and write it to the sky directory.
+    Returns the hour's placeholder and, with responsive=True, the manifest
+    entries of the resize pyramid written alongside it.
+    """
+    img_rgb, _, _ = render_sky_hour(base_img, hour, max_memory=max_memory)
+    return write_sky_hour(img_rgb, hour, responsive, encoding, directory, quality)
+
+def write_sky_hour(img_rgb, hour, responsive=False, encoding=None, directory=sky_dir, quality=JPEG_QUALITY):
+    """Write a rendered hour (size-targeted with encoding), its responsive variants and placeholder"""
+    from placeholders import make_placeholder
+    from responsive_export import describe, export_responsive
+    from sky_atlas import keep_frame
+    from targeted_encoding import save_encoded
+    from tracing import trace_stage
+    # Save image
+    output_path = get_output_path(hour, directory)
+    with trace_stage('encode', hour=hour):
+        encoded = save_encoded(img_rgb, output_path, quality, encoding)
+    if is_site_dir(directory):
+        # Lossless copy for the atlas of the page's hours
+        with trace_stage('atlas_frame', hour=hour):
+            keep_frame(hour, img_rgb, output_path)
+    
+    entries = []
+    if responsive:
+        name = str(hour).zfill(2)
+        with trace_stage('responsive', hour=hour):
+            entries = [describe(output_path, img_rgb, 'jpeg')] + export_responsive(img_rgb, name)
+    with trace_stage('placeholder', hour=hour):
+        placeholder = make_placeholder(img_rgb)
+    
+    brightness = get_lighting_adjustment(hour)[0]
+    print(f"Generated {output_path} - Brightness: {brightness:.2f}, {', '.join(get_visible_elements(hour))}")
+    return {'variants': entries, 'placeholder': placeholder, 'encoding': encoded}
+
+def write_alias_hour(hour, canonical, written, directory=sky_dir):
+    """Point a duplicate hour at its canonical hour's file and variants instead of encoding it"""
+    from frame_dedup import link_frame
+    from tracing import trace_stage
+    output_path = get_output_path(hour, directory)
+    canonical_path = get_output_path(canonical, directory)
+    with trace_stage('link', hour=hour):
+        link_frame(canonical_path, output_path)
+    print(f"Linked {output_path} to {canonical_path} (duplicate frame)")
+    return {'variants': written['variants'], 'placeholder': written['placeholder'], 'encoding': None,
+            'alias': str(canonical).zfill(2)}
+
+def get_dedup_view(background, hour):
+    """The hour's lighting on (a small copy of) the background, before its sky elements"""
+    img = background
+    for _, _, stage in sky_stages(*background.size, hour, 0, background.width)[:2]:
+        img = stage(img)
+    return img.convert('RGB')
+
+def get_fixed_elements(hour):
+    """Sky elements a duplicate frame must share exactly: the sun and star field (the moon may move)"""
+    sun = get_sun_position(hour)
+    return sun, get_sun_style(hour) if sun else None, get_star_style(hour)
+
+def trace_hour(base_img, hour, responsive=False, max_memory=None, encoding=None, memory=False, profile=False,
+               directory=sky_dir, quality=JPEG_QUALITY):
+    """Render and save one hour under a tracer; returns (result, trace record)"""
+    from tracing import traced_call
+    return traced_call(save_sky_hour, base_img, hour, responsive, max_memory, encoding, directory, quality,
+                       category='sky', memory=memory, profile=profile)
+
+def build_sky_graph(base_img, hours, full_size=None):
+    """Render graph of the hours' whole-image pipelines over one background (or a proxy of a full_size one)"""
+    from render_graph import RenderGraph
+    graph = RenderGraph()
+    source = graph.source('background', base_img)
+    for hour in hours:
+        graph.output(hour, add_sky_hour(graph, source, *base_img.size, hour, full_size))
+    return graph
+
+def render_hour(source, hour):
+    """The hour's sky over source (a PIL image) as a new RGB image; writes nothing"""
+    return render_sky_hour(source, hour)[0]
+
+def render_hours(source, hours=HOURS):
+    """
+    {hour: RGB image} for the hours over source, rendered in memory as one
+    render graph so stages the hours have in common run once; writes nothing
+    """
+    return dict(build_sky_graph(source, hours).run())
+
+def preview_hours(hours, factor, path=PREVIEW_PATH, background=background_path):
+    """Render the hours from a 1/factor proxy of the background and tile them into a contact sheet"""
+    from preview import load_proxy, save_contact_sheet
+    started = time.perf_counter()
+    proxy, full_size = load_proxy(background, factor)
+    frames = [(f'{hour:02d}:00', img) for hour, img in build_sky_graph(proxy, hours, full_size).run()]
+    save_contact_sheet(frames, path, title=f"Sky at 1/{factor} scale ({proxy.width}x{proxy.height} proxies)")
+    print(f"Previewed {len(frames)} hours in {time.perf_counter() - started:.2f} s")
+
+def prepare_sky_hour(width, height, hour):
+    """Draw the hour's cached star field and sun/moon sprites ahead of its render"""
+    get_star_field(width, height, hour)
+    if get_sun_position(hour):
+        get_sun_sprite(get_sun_style(hour))
+    if get_moon_position(hour):
+        get_moon_sprite()
+
+def pipeline_hours(hours, responsive=False, encoding=None, depth=None, trace=None, dedup=None,
+                   path=background_path, directory=sky_dir, quality=JPEG_QUALITY):
+    """
+    Render the hours as a render graph in a three-stage pipeline: decode (the
+    background, once, then each hour's sprites ahead of the render), render and
+    encode (several hours at once when their quality is searched). With a
+    FrameDeduplicator, a dedup stage before the encode links frames to an
+    earlier hour with the same sun and stars and practically the same lighting
+    (get_dedup_view) instead of encoding them. depth defaults to
+    pipeline.PIPELINE_DEPTH.
+    Returns the pipeline and a (result, trace record) pair per hour.
+    """
+    from concurrent.futures import Future
+    from pipeline import PIPELINE_DEPTH, Pipeline
+    from sky_atlas import keep_frame
+    from targeted_encoding import encode_workers
+    state = {'written': {}}
+    def decode(hour):
+        if 'outputs' not in state:
+            base_img = load_background(path)
+            print(f"Loaded background image: {base_img.width}x{base_img.height}")
+            state['graph'] = build_sky_graph(base_img, hours)
+            state['outputs'] = state['graph'].run()
+            state['size'] = base_img.size
+            if dedup:
+                from frame_dedup import SSIM_WIDTH
+                from PIL import Image
+                # Lighting comparisons run at SSIM size anyway
+                state['view'] = base_img.convert('RGB')
+                state['view'].thumbnail((SSIM_WIDTH, base_img.height), Image.BOX)
+        prepare_sky_hour(*state['size'], hour)
+        return hour
+    def render(hour):
+        return next(state['outputs'])
+    def find_duplicate(item):
+        hour, img_rgb = item
+        view = get_dedup_view(state['view'], hour)
+        canonical = dedup.match(str(hour).zfill(2), view, get_fixed_elements(hour))
+        if canonical is None:
+            # Its aliases may reach another encode worker before it is written
+            state['written'][hour] = Future()
+        return hour, img_rgb, canonical
+    def encode(item):
+        hour, img_rgb = item[:2]
+        canonical = item[2] if dedup else None
+        if canonical is not None:
+            result = write_alias_hour(hour, int(canonical), state['written'][int(canonical)].result(), directory)
+            if is_site_dir(directory):
+                keep_frame(hour, img_rgb, get_output_path(hour, directory))
+            return result
+        started = time.perf_counter()
+        try:
+            result = write_sky_hour(img_rgb, hour, responsive, encoding, directory, quality)
+        except BaseException as error:
+            if dedup:
+                state['written'][hour].set_exception(error)
+            raise
+        if dedup:
+            dedup.record_encode(str(hour).zfill(2), time.perf_counter() - started,
+                                get_output_path(hour, directory))
+            state['written'][hour].set_result(result)
+        return result
+    
+    stages = [('decode', decode), ('render', render)]
+    if dedup:
+        stages.append(('dedup', find_duplicate))
+    if depth is None:
+        depth = PIPELINE_DEPTH
+    pipeline = Pipeline(stages + [('encode', encode, encode_workers(encoding))], depth=depth, trace=trace)
+    results = list(pipeline.run(hours))
+    print(state['graph'].summary())
+    return pipeline, list(zip(results, pipeline.item_records()))
+
+def _save_next_hour(outputs, responsive, encoding, quality=JPEG_QUALITY):
+    """Evaluate the next hour of a running render graph and write it"""
+    hour, img_rgb = next(outputs)
+    return write_sky_hour(img_rgb, hour, responsive, encoding, quality=quality)
+
+def load_background(path=background_path):
+    """Decode the background once so every hour can share it"""
+    from PIL import Image
+    from tracing import trace_stage
+    with trace_stage('decode', path=path):
+        base_img = Image.open(path)
+        base_img.load()
+    return base_img
+
+def _render_shared_hour(handle, hour, responsive, max_memory, encoding, memory, profile, directory, quality):
+    """Pool worker: render one hour from the shared decoded background"""
+    from shared_source import attach_image
+    return trace_hour(attach_image(handle), hour, responsive, max_memory, encoding, memory, profile,
+                      directory, quality)
+
+def record_hours(cache, keys, hours, results, directory=sky_dir):
+    """
+    Record written hours in the build cache and, for the site's sky directory,
+    in the responsive manifest, placeholders and aliases
+    """
+    from frame_dedup import update_aliases
+    from placeholders import update_placeholders
+    from responsive_export import update_manifest
+    variants = {}
+    placeholders = {}
+    aliases = {}
+    for hour, result in zip(hours, results):
+        output_path = get_output_path(hour, directory)
+        entries = result['variants']
+        extras = [entry['src'] for entry in entries if entry['src'] != output_path]
+        cache.record(output_path, keys[hour], 'sky', extras=extras)
+        variants[str(hour).zfill(2)] = entries
+        placeholders[str(hour).zfill(2)] = result['placeholder']
+        if result.get('alias'):
+            aliases[str(hour).zfill(2)] = result['alias']
+    if is_site_dir(directory):
+        update_manifest(variants)
+        update_placeholders(placeholders)
+        update_aliases(aliases, [str(hour).zfill(2) for hour in hours])
+    cache.save()
+
+def is_site_dir(directory):
+    """Whether directory is the site's sky directory, whose manifests the page reads"""
+    return os.path.abspath(directory) == os.path.abspath(sky_dir)
+
+def watch_hours(args, encoding):
+    """
+    --watch: keep the background and sprite caches in memory and re-render the
+    hours an edit to the background or the parameter tables affects. Rendering
+    goes through the reloaded module, so edited tables are picked up.
+    """
+    from sky_atlas import update_atlas
+    from watcher import WarmModule, watch
+    warm = WarmModule('generate_sky_images', tables=('SKY_COLORS', 'LIGHTING_ADJUSTMENTS'),
+                      caches=('_sprite_cache',))
+    cache = BuildCache(force=args.force)
+    state = {}
+
+    def render(module, changed, rebuild):
+        if args.background in changed:
+            state['background'] = module.load_background(args.background)
+            state['hash'] = hash_file(args.background)
+        keys = {hour: module.sky_cache_key(state['hash'], hour, args.responsive, encoding, quality=args.quality)
+                for hour in args.hours}
+        stale = [hour for hour in args.hours if rebuild or not cache.is_fresh(get_output_path(hour), keys[hour])]
+        cache.force = False
+        if stale:
+            outputs = module.build_sky_graph(state['background'], stale).run()
+            results = [module._save_next_hour(outputs, args.responsive, encoding, args.quality) for _ in stale]
+            module.record_hours(cache, keys, stale, results)
+            if args.atlas:
+                update_atlas(cache)
+        return stale
+
+    watch(warm, [args.background], render)
+
+def check_tiles(base_img, hours, strip=97):
+    """Verify strip rendering is identical to the whole-image render"""
+    from PIL import ImageChops
+    failures = 0
+    for hour in hours:
+        whole = render_sky_hour(base_img, hour)[0]
+        tiled = render_sky_hour(base_img, hour, strip=strip)[0]
+        bbox = ImageChops.difference(whole, tiled).getbbox()
+        if bbox:
+            failures += 1
+        print(f"  {hour:02d}:00 - {f'differs within {bbox} (MISMATCH)' if bbox else 'identical (ok)'}")
+    return failures == 0
+
+def parse_hours(spec):
+    """'0-5,18,20-23' -> [0, 1, 2, 3, 4, 5, 18, 20, 21, 22, 23]"""
+    hours = set()
+    try:
+        for part in spec.split(','):
+            first, _, last = part.partition('-')
+            hours.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected hours like 0-5,18,20-23, got {spec!r}")
+    if not hours or not hours <= set(HOURS):
+        raise argparse.ArgumentTypeError(f"hours must be within 0-23, got {spec!r}")
+    return sorted(hours)
+
+def parse_args():
+    from frame_dedup import DEDUP_MIN_SSIM
+    from pipeline import PIPELINE_DEPTH
+    from preview import PREVIEW_FACTOR
+    from targeted_encoding import MIN_SSIM
+    parser = argparse.ArgumentParser(description="Generate the 24 hourly sky images")
+    parser.add_argument('--hours', type=parse_hours, default=list(HOURS), metavar='LIST',
+                        help="only these hours, e.g. 0-5,18,20-23 (default: all 24)")
+    parser.add_argument('--background', default=background_path, metavar='PATH',
+                        help=f"background image to light (default: {background_path})")
+    parser.add_argument('--out-dir', default=sky_dir, metavar='DIR',
+                        help=f"directory for the HH.jpg files (default: {sky_dir}); elsewhere only the "
+                             "images are written, not the site's manifests or hashed copies")
+    parser.add_argument('--quality', type=int, default=JPEG_QUALITY,
+                        help=f"JPEG quality, and the cap for --target-size (default: {JPEG_QUALITY})")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="render hours in N worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument('--queue-depth', type=int, default=PIPELINE_DEPTH, metavar='N',
+                        help="hours waiting between decode, render and encode in a serial run "
+                             f"(default: {PIPELINE_DEPTH})")
+    parser.add_argument('--force', action='store_true',
+                        help="ignore the build cache and re-render every hour")
+    parser.add_argument('--responsive', action='store_true',
+                        help="also write 640/1280/1920px JPEG/WebP/AVIF variants and their manifest")
+    parser.add_argument('--atlas', action='store_true',
+                        help="also pack the page's hours into one sky atlas per tier (images/sky/atlas/)")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and re-render the hours affected by edits to the background "
+                             "or the parameter tables")
+    parser.add_argument('--max-memory', type=int, metavar='MB',
+                        help="render in column strips sized to keep each render under MB (output is identical)")
+    parser.add_argument('--check', action='store_true',
+                        help="compare strip rendering against the whole-image render and exit")
+    parser.add_argument('--target-size', type=int, nargs='?', const=500, metavar='KB',
+                        help="encode each image at the lowest quality (up to --quality) that keeps --min-ssim, "
+                             "flagging images over KB (default budget: 500)")
+    parser.add_argument('--min-ssim', type=float, default=MIN_SSIM,
+                        help=f"SSIM floor against the unencoded render for --target-size (default: {MIN_SSIM})")
+    parser.add_argument('--progressive', action='store_true', help="write progressive JPEGs")
+    parser.add_argument('--dedup', type=float, nargs='?', const=DEDUP_MIN_SSIM, metavar='SSIM',
+                        help="link hours whose frame matches an earlier hour's (perceptual hash, then SSIM >= "
+                             f"SSIM; default {DEDUP_MIN_SSIM}) instead of encoding them, listed in "
+                             "images/sky/aliases.json")
+    parser.add_argument('--preview', type=int, nargs='?', const=PREVIEW_FACTOR, metavar='FACTOR',
+                        help="only render every hour at 1/FACTOR size (default: "
+                             f"{PREVIEW_FACTOR}) into a labelled contact sheet")
+    parser.add_argument('--preview-out', default=PREVIEW_PATH, metavar='PATH',
+                        help=f"contact sheet path for --preview (default: {PREVIEW_PATH})")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="write per-stage timings as a Chrome trace-event JSON file")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="also record the tracemalloc peak of every stage (slower)")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write a cProfile dump of the slowest hour to PATH")
+    return parser.parse_args()
+
+def main():
+    from frame_dedup import FrameDeduplicator
+    from hashed_assets import publish_assets
+    from shared_source import SharedImage, run_in_pool
+    from sky_atlas import update_atlas
+    from targeted_encoding import encoding_options, summarize
+    from tracing import TraceCollector, traced_call
+    args = parse_args()
+    if args.watch and (args.max_memory or args.jobs != 1):
+        raise SystemExit("--watch renders whole images in this process (no --jobs or --max-memory)")
+    if args.dedup and (args.watch or args.max_memory or args.jobs != 1):
+        raise SystemExit("--dedup compares the frames of a serial whole-image batch "
+                         "(no --watch, --jobs or --max-memory)")
+    site = is_site_dir(args.out_dir)
+    if not site and (args.responsive or args.atlas or args.dedup or args.watch):
+        raise SystemExit(f"--responsive, --atlas, --dedup and --watch update the site's manifests in {sky_dir}/ "
+                         "(no --out-dir)")
+    
+    # Load the background image
+    if not os.path.exists(args.background):
+        raise SystemExit(f"Error: Background image not found at {args.background}")
+    
+    if args.check:
+        print("Checking strip rendering against the whole-image render...")
+        raise SystemExit(0 if check_tiles(load_background(args.background), args.hours) else 1)
+    
+    if args.preview:
+        preview_hours(args.hours, args.preview, args.preview_out, args.background)
+        return
+    
+    # Create sky directory if it doesn't exist
+    os.makedirs(args.out_dir, exist_ok=True)
+    
+    encoding = encoding_options(args.target_size, args.min_ssim, args.progressive)
+    if args.watch:
+        watch_hours(args, encoding)
+        return
+    
+    # Only re-render hours whose source, parameters or renderer changed
+    cache = BuildCache(force=args.force)
+    source_hash = hash_file(args.background)
+    keys = {hour: sky_cache_key(source_hash, hour, args.responsive, encoding, args.dedup, args.quality)
+            for hour in args.hours}
+    stale = [hour for hour in args.hours if not cache.is_fresh(get_output_path(hour, args.out_dir), keys[hour])]
+    
+    tracing = TraceCollector()
+    profile = bool(args.profile)
+    max_memory = args.max_memory * MB if args.max_memory else None
+    if stale and args.jobs == 1 and not max_memory:
+        # Serial whole-image batches share stages between hours, and each hour's
+        # encode overlaps the next hour's render
+        trace = {'category': 'sky', 'memory': args.trace_memory, 'profile': profile}
+        dedup = FrameDeduplicator(args.dedup) if args.dedup else None
+        pipeline, traced = pipeline_hours(stale, args.responsive, encoding, args.queue_depth, trace, dedup,
+                                          args.background, args.out_dir, args.quality)
+        print(pipeline.summary())
+        if dedup:
+            print(dedup.summary())
+    elif stale:
+        base_img, record = traced_call(load_background, args.background, category='sky', memory=args.trace_memory)
+        tracing.add(record)
+        width, height = base_img.size
+        print(f"Loaded background image: {width}x{height}")
+        
+        # Generate images
+        if args.jobs == 1:
+            traced = [trace_hour(base_img, hour, args.responsive, max_memory, encoding, args.trace_memory, profile,
+                                 args.out_dir, args.quality)
+                      for hour in stale]
+        else:
+            with SharedImage(base_img) as shared:
+                tasks = [(shared.handle, hour, args.responsive, max_memory, encoding, args.trace_memory, profile,
+                          args.out_dir, args.quality)
+                         for hour in stale]
+                traced = list(run_in_pool(_render_shared_hour, tasks, args.jobs))
+    if stale:
+        for hour, (_, record) in zip(stale, traced):
+            tracing.add(record, label=f'{hour:02d}:00')
+        record_hours(cache, keys, stale, [result for result, _ in traced], args.out_dir)
+        if encoding and encoding['budget']:
+            print(f"\n{summarize([result['encoding'] for result, _ in traced if result['encoding']])}")
+    if args.atlas:
+        print("\nPacking sky atlas...")
+        update_atlas(cache)
+    if site:
+        print("\nPublishing content-hashed assets...")
+        publish_assets()
+    
+    print(f"\n✓ Successfully generated {len(args.hours)} sky images in {args.out_dir}/")
+    if args.hours == list(HOURS):
+        print("Images range from 00.jpg (midnight) to 23.jpg (11 PM)")
+    print(f"Each image overlays time-of-day lighting on {os.path.basename(args.background)}")
+    print(cache.summary())
+    if tracing.events:
+        print(f"\nStage timings:\n{tracing.summary()}")
+    if args.trace:
+        tracing.write_trace(args.trace)
+        print(f"Wrote trace to {args.trace}")
+    if args.profile and tracing.slowest:
+        print(f"Wrote profile of slowest hour ({tracing.write_profile(args.profile)}) to {args.profile}")
 
-print(f"\n✓ Successfully generated 24 sky images in {sky_dir}/")
-print("Images range from 00.jpg (midnight) to 23.jpg (11 PM)")
-print("Each image overlays time-of-day lighting on rich-main.jpg")
+if __name__ == '__main__':
+    main()
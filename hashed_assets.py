@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Content-hashed copies of the generated sky assets for long-term caching.
+
+The generators overwrite fixed names (images/sky/07.jpg), which browsers and
+the CDN can only cache briefly. After every build each sky asset (the hour
+JPEGs, responsive variants, atlas files and their JSON manifests) is copied
+to images/sky/hashed/<hash>.<ext>, and images/sky/assets.json maps every
+original path to its hashed copy. A regeneration that changes nothing produces
+the same names, so repeat visitors fetch only the small mapping, and identical
+files (hours deduplicated by frame_dedup) share one copy. Only files the current
+manifests reference are published, never empty ones or leftovers of earlier runs.
+The _headers file served by Cloudflare marks the hashed copies immutable and
+gives the mapping a short TTL.
+
+The hashed names of the JSON manifests are also inlined into index.html, so
+SkyTimeLapse can fetch them alongside the mapping instead of after it.
+
+Copies rather than hard links: the exporters rewrite their files in place.
+
+Run directly to rebuild the hashed copies from the files already on disk.
+"""
+
+import json
+import os
+import re
+import shutil
+
+from build_cache import hash_file
+from responsive_export import RESPONSIVE_DIR
+from sky_atlas import ATLAS_DIR
+
+SKY_DIR = 'images/sky'
+HASHED_DIR = 'images/sky/hashed'
+ASSETS_PATH = 'images/sky/assets.json'
+HEADERS_PATH = '_headers'
+INDEX_PATH = 'index.html'
+HASH_LENGTH = 12
+
+START_MARKER = '<!-- sky-manifests:start -->'
+END_MARKER = '<!-- sky-manifests:end -->'
+
+# Cache-Control per URL pattern; Cloudflare merges every matching rule, so they must not overlap
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MANIFEST_TTL = 'public, max-age=60, must-revalidate'
+
+def _load_manifest(path):
+    """Parsed JSON manifest, or None if it is missing"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def sky_assets(sky_dir=SKY_DIR):
+    """
+    Paths of the generated sky files that get hashed copies: the hour JPEGs and
+    the files the current responsive, atlas and alias manifests reference
+    (leftovers of earlier runs and empty manifests are not published)
+    """
+    paths = [os.path.join(sky_dir, name) for name in sorted(os.listdir(sky_dir))
+             if re.fullmatch(r'\d\d\.jpg', name)]
+    responsive_path = os.path.join(RESPONSIVE_DIR, 'manifest.json')
+    responsive = _load_manifest(responsive_path)
+    if responsive and responsive['hours']:
+        paths.append(responsive_path)
+        paths += [entry['src'] for entries in responsive['hours'].values() for entry in entries]
+    atlas_path = os.path.join(ATLAS_DIR, 'manifest.json')
+    atlas = _load_manifest(atlas_path)
+    if atlas and atlas['tiers']:
+        paths.append(atlas_path)
+        paths += [entry['src'] for tier in atlas['tiers'].values() for entry in tier['files']]
+    aliases_path = os.path.join(sky_dir, 'aliases.json')
+    if _load_manifest(aliases_path):
+        paths.append(aliases_path)
+    paths = [os.path.normpath(path) for path in paths]
+    return [path for path in dict.fromkeys(paths) if os.path.isfile(path) and os.path.getsize(path) > 0]
+
+def hashed_name(path, digest):
+    """07.jpg -> <hash>.jpg"""
+    return digest[:HASH_LENGTH] + os.path.splitext(path)[1]
+
+def inline_manifests(assets, index_path=INDEX_PATH):
+    """Replace the JSON block between the sky-manifests markers in index.html with the manifests' hashed names"""
+    with open(index_path) as f:
+        html = f.read()
+    if START_MARKER not in html or END_MARKER not in html:
+        print(f"  Warning: manifest markers not found in {index_path}, skipping inline")
+        return
+    manifests = {path: target for path, target in assets.items() if path.endswith('.json')}
+    payload = json.dumps(manifests, sort_keys=True, separators=(',', ':'))
+    block = (f'{START_MARKER}\n'
+             f'        <script type="application/json" id="sky-manifests">{payload}</script>\n'
+             f'        {END_MARKER}')
+    pattern = re.escape(START_MARKER) + '.*?' + re.escape(END_MARKER)
+    html = re.sub(pattern, lambda _: block, html, flags=re.DOTALL)
+    with open(index_path, 'w') as f:
+        f.write(html)
+
+def publish_assets(sky_dir=SKY_DIR, directory=HASHED_DIR, manifest_path=ASSETS_PATH, index_path=INDEX_PATH):
+    """
+    Copy every sky asset to its content-hashed name (skipping names that
+    already exist), prune hashed files no longer referenced, write the
+    {path: hashed path} mapping and inline the manifests' entries into
+    index.html. Returns the mapping.
+    """
+    os.makedirs(directory, exist_ok=True)
+    assets = {}
+    copied = 0
+    for path in sky_assets(sky_dir):
+        target = os.path.join(directory, hashed_name(path, hash_file(path)))
+        if not os.path.exists(target):
+            shutil.copyfile(path, target)
+            copied += 1
+        assets[path.replace(os.sep, '/')] = target.replace(os.sep, '/')
+
+    current = {os.path.basename(target) for target in assets.values()}
+    stale = [name for name in os.listdir(directory) if name not in current]
+    for name in stale:
+        os.remove(os.path.join(directory, name))
+
+    with open(manifest_path, 'w') as f:
+        json.dump(assets, f, indent=2, sort_keys=True)
+        f.write('\n')
+    inline_manifests(assets, index_path)
+    write_headers()
+    print(f"  Hashed assets: {len(assets)} files, {copied} new, {len(stale)} removed")
+    return assets
+
+def write_headers(path=HEADERS_PATH):
+    """Cloudflare static-assets _headers: immutable hashed copies, short-lived mapping"""
+    rules = [
+        (f'/{HASHED_DIR}/*', IMMUTABLE),
+        (f'/{ASSETS_PATH}', MANIFEST_TTL),
+    ]
+    with open(path, 'w') as f:
+        f.write('# Generated by hashed_assets.py\n')
+        for pattern, cache_control in rules:
+            f.write(f'{pattern}\n  Cache-Control: {cache_control}\n')
+
+def main():
+    assets = publish_assets()
+    print(f"Wrote {ASSETS_PATH} ({len(assets)} assets) and {HEADERS_PATH}, and inlined the manifests into {INDEX_PATH}")
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,12 @@ class SkyTimeLapse {
     this.sections = [];
     this.images = {};
     this.currentImage = null;
+    this.variants = null;
+    this.formats = new Set(['jpeg']);
+    this.aliases = {};
+    this.assets = {};
+    this.manifests = this.readInlined('sky-manifests');
+    this.placeholders = this.readInlined('sky-placeholders');
 
     // Hours that have corresponding images
     this.availableHours = [1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23];
@@ -16,27 +22,176 @@ class SkyTimeLapse {
     this.init();
   }
 
-  init() {
+  async init() {
     // Get all hour sections
     this.sections = Array.from(document.querySelectorAll(".hour-section"));
 
-    // Preload all sky images
-    this.preloadImages();
+    // The content-hashed asset map, responsive variants and duplicate-frame
+    // aliases (if generated) are fetched together before choosing images; the
+    // manifests' hashed names are inlined, so none waits on the asset map.
+    // The atlas manifest is requested now too and read after first paint
+    const atlasManifest = this.fetchManifest('images/sky/atlas/manifest.json');
+    await Promise.all([this.loadAssets(), this.loadVariants(), this.loadAliases()]);
+
+    // Preload all sky images (one packed atlas when available)
+    this.preloadImages(atlasManifest);
 
     // Set up scroll listener
     this.setupScrollListener();
   }
 
-  preloadImages() {
-    this.availableHours.forEach(hour => {
+  async fetchManifest(path) {
+    // Parsed JSON manifest (through its inlined hashed name), or null if it is missing
+    try {
+      const response = await fetch(this.manifests[path] || path);
+      return response.ok ? await response.json() : null;
+    } catch (error) {
+      return null;
+    }
+  }
+
+  async loadVariants() {
+    const [manifest, formats] = await Promise.all([
+      this.fetchManifest('images/sky/responsive/manifest.json'),
+      this.detectFormats()
+    ]);
+    // Also used to pick the atlas format, with or without responsive variants
+    this.formats = formats;
+    // No manifest: fall back to the full-size JPEGs
+    this.variants = manifest?.hours || null;
+  }
+
+  async loadAssets() {
+    // path -> immutable content-hashed copy (hashed_assets.py); the only sky file that is revalidated
+    try {
+      const response = await fetch('images/sky/assets.json');
+      if (response.ok) this.assets = await response.json();
+    } catch (error) {
+      this.assets = {};
+    }
+  }
+
+  asset(path) {
+    return this.assets[path] || path;
+  }
+
+  async loadAliases() {
+    // Hours whose frame duplicates another hour's (frame_dedup.py) reuse that hour's image
+    this.aliases = (await this.fetchManifest('images/sky/aliases.json')) || {};
+  }
+
+  detectFormats() {
+    // 1x1 images; a browser that can decode them supports the format
+    const probes = {
+      webp: 'data:image/webp;base64,UklGRjwAAABXRUJQVlA4IDAAAADQAQCdASoBAAEAAUAmJaACdLoB+AADsAD+8ut//NgVzXPv9//S4P0uD9Lg/9KQAAA=',
+      avif: 'data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1BMUIAAADrbWV0YQAAAAAAAAAhaGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAAAAAAAOcGl0bQAAAAAAAQAAAB5pbG9jAAAAAEQAAAEAAQAAAAEAAAETAAAAKgAAAChpaW5mAAAAAAABAAAAGmluZmUCAAAAAAEAAGF2MDFDb2xvcgAAAABqaXBycAAAAEtpcGNvAAAAFGlzcGUAAAAAAAAAAQAAAAEAAAAQcGl4aQAAAAADCAgIAAAADGF2MUOBAAwAAAAAE2NvbHJuY2x4AAEADQAGgAAAABdpcG1hAAAAAAAAAAEAAQQBAoMEAAAAMm1kYXQSAAoIGAAGiAhoNCAyHBTHh4ZlAgggnlAAAABIWtlc1jIgMQsbXgqRN4A='
+    };
+    const checks = Object.entries(probes).map(([format, uri]) => new Promise(resolve => {
       const img = new Image();
-      const hourStr = hour.toString().padStart(2, '0');
-      img.src = `images/sky/${hourStr}.jpg`;
-      this.images[hour] = img;
-    });
+      img.onload = () => resolve(img.width > 0 ? format : null);
+      img.onerror = () => resolve(null);
+      img.src = uri;
+    }));
+    return Promise.all(checks).then(found => new Set(['jpeg', ...found.filter(Boolean)]));
+  }
+
+  neededSize() {
+    // Cellular and data-saver visitors get 1x assets; others up to 2x
+    const connection = navigator.connection;
+    const constrained = connection && (connection.saveData || connection.type === 'cellular' ||
+      ['slow-2g', '2g', '3g'].includes(connection.effectiveType));
+    const density = constrained ? 1 : Math.min(window.devicePixelRatio || 1, 2);
+    return [window.innerWidth * density, window.innerHeight * density];
+  }
+
+  pickSource(hour) {
+    const name = hour.toString().padStart(2, '0');
+    const hourStr = this.aliases[name] || name;
+    const entries = (this.variants?.[hourStr] || []).filter(entry => this.formats.has(entry.format));
+    if (entries.length === 0) return this.asset(`images/sky/${hourStr}.jpg`);
+
+    // Smallest file that still covers the viewport (object-fit: cover), else the largest available
+    const [neededWidth, neededHeight] = this.neededSize();
+    const covering = entries.filter(entry => entry.width >= neededWidth && entry.height >= neededHeight);
+    const largest = Math.max(...entries.map(entry => entry.width));
+    const candidates = covering.length ? covering : entries.filter(entry => entry.width === largest);
+    return this.asset(candidates.reduce((best, entry) => (entry.bytes < best.bytes ? entry : best)).src);
+  }
+
+  async loadAtlas(atlasManifest) {
+    // One request for the other hours: the smallest atlas tier whose frames cover the viewport.
+    // Tiers stop short of desktop sizes, where a per-hour file is cheaper than a multi-MB atlas
+    try {
+      const manifest = await atlasManifest;
+      if (!manifest) return false;
+      const tiers = Object.values(manifest.tiers);
+      const [neededWidth, neededHeight] = this.neededSize();
+      const covering = tiers.filter(tier => tier.frame[0] >= neededWidth && tier.frame[1] >= neededHeight);
+      if (covering.length === 0) return false;
+      const tier = covering.reduce((best, t) => (t.frame[0] < best.frame[0] ? t : best));
+      const files = tier.files.filter(entry => this.formats.has(entry.format));
+      if (files.length === 0) return false;
+
+      const atlas = new Image();
+      atlas.fetchPriority = 'low';
+      atlas.src = this.asset(files.reduce((best, entry) => (entry.bytes < best.bytes ? entry : best)).src);
+      await atlas.decode();
+
+      // Each hour is drawn straight from the decoded atlas when it is shown (see createSkyElement);
+      // hours already fetched on their own keep their file
+      const [width, height] = tier.frame;
+      Object.entries(tier.frames).forEach(([hourStr, [x, y]]) => {
+        const hour = parseInt(hourStr, 10);
+        if (!this.images[hour]) this.images[hour] = { atlas, x, y, width, height };
+      });
+      return true;
+    } catch (error) {
+      // No atlas (or it failed to load): fall back to one request per hour
+      return false;
+    }
+  }
+
+  readInlined(id) {
+    // JSON inlined into index.html by the image generators (placeholders.py, hashed_assets.py)
+    const element = document.getElementById(id);
+    try {
+      return element ? JSON.parse(element.textContent) : {};
+    } catch (error) {
+      return {};
+    }
+  }
+
+  showPlaceholder(hour) {
+    // Painted behind the sky images, so it shows until the full image has loaded
+    const entry = this.placeholders[hour.toString().padStart(2, '0')];
+    if (entry) {
+      this.container.style.background = `${entry.color} url(${entry.lqip}) center / cover no-repeat`;
+    }
+  }
+
+  loadHour(hour, priority) {
+    const img = new Image();
+    img.fetchPriority = priority;
+    img.decoding = 'async';
+    img.src = this.pickSource(hour);
+    this.images[hour] = img;
+  }
+
+  async preloadImages(atlasManifest) {
+    // The section in view is fetched on its own first, so first paint never waits on the atlas
+    const initialHour = this.getHourInView();
+    if (this.availableHours.includes(initialHour)) this.loadHour(initialHour, 'high');
 
     // Set initial image after short delay
     setTimeout(() => this.handleScroll(), 100);
+
+    // The rest come from one packed atlas when a tier covers the viewport, else one request each
+    if (await this.loadAtlas(atlasManifest)) {
+      // Scrolling may have moved on to an hour that was waiting on the atlas
+      this.handleScroll();
+      return;
+    }
+    this.availableHours.filter(hour => !this.images[hour]).forEach(hour => this.loadHour(hour, 'low'));
   }
 
   setupScrollListener() {
@@ -53,7 +208,7 @@ class SkyTimeLapse {
     });
   }
 
-  handleScroll() {
+  getHourInView() {
     const scrollPosition = window.scrollY + window.innerHeight / 2;
 
     // Find which section is currently in view
@@ -63,25 +218,45 @@ class SkyTimeLapse {
       const sectionBottom = sectionTop + section.offsetHeight;
 
       if (scrollPosition >= sectionTop && scrollPosition < sectionBottom) {
-        const hour = parseInt(section.dataset.hour);
-        if (hour !== this.currentHour) {
-          this.transitionToImage(hour);
-          this.currentHour = hour;
-        }
-        break;
+        return parseInt(section.dataset.hour);
       }
     }
+    return null;
+  }
+
+  handleScroll() {
+    const hour = this.getHourInView();
+    // An hour whose image is not requested yet is retried on the next scroll
+    if (hour !== null && hour !== this.currentHour && this.images[hour]) {
+      this.transitionToImage(hour);
+      this.currentHour = hour;
+    }
+  }
+
+  createSkyElement(image) {
+    // Atlas frames are copied onto a canvas (no re-encode); per-hour files stay plain <img> elements
+    if (!image.atlas) {
+      const imgElement = document.createElement('img');
+      imgElement.src = image.src;
+      return imgElement;
+    }
+    const canvas = document.createElement('canvas');
+    canvas.width = image.width;
+    canvas.height = image.height;
+    canvas.getContext('2d').drawImage(image.atlas, image.x, image.y, image.width, image.height,
+      0, 0, image.width, image.height);
+    return canvas;
   }
 
   transitionToImage(hour) {
     if (!this.images[hour]) return;
 
     const newImg = this.images[hour];
+    this.showPlaceholder(hour);
 
     // Set initial image
     if (!this.currentImage) {
-      const imgElement = document.createElement('img');
-      imgElement.src = newImg.src;
+      const imgElement = this.createSkyElement(newImg);
       imgElement.style.opacity = '1';
       imgElement.classList.add('sky-image', 'active');
       this.container.innerHTML = '';
@@ -91,8 +266,7 @@ class SkyTimeLapse {
     }
 
     // Crossfade to new image
-    const newImgElement = document.createElement('img');
-    newImgElement.src = newImg.src;
+    const newImgElement = this.createSkyElement(newImg);
     newImgElement.style.opacity = '0';
     newImgElement.classList.add('sky-image');
     this.container.appendChild(newImgElement);
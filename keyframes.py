@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Keyframe interpolation over a 24-hour day.
+
+Parameter tables are keyed by hour. Any fractional time of day is evaluated by
+linearly interpolating between the surrounding keyframes, wrapping around
+midnight. Values may be numbers, tuples of numbers or dicts of those.
+Evaluating exactly at a keyframe returns its value unchanged.
+"""
+
+import bisect
+
+DAY_HOURS = 24
+
+def lerp(a, b, t):
+    """Linearly interpolate numbers, tuples or dicts of the same shape"""
+    if isinstance(a, dict):
+        return {key: lerp(a[key], b[key], t) for key in a}
+    if isinstance(a, (tuple, list)):
+        return tuple(lerp(x, y, t) for x, y in zip(a, b))
+    return a + (b - a) * t
+
+def interpolate_keyframes(keyframes, time):
+    """Value of the keyframe table at a (possibly fractional) hour of the day"""
+    time = time % DAY_HOURS
+    if time in keyframes:
+        return keyframes[time]
+
+    hours = sorted(keyframes)
+    index = bisect.bisect_right(hours, time)
+    before = hours[index - 1]  # index 0 wraps to the last keyframe of the previous day
+    after = hours[index % len(hours)]
+
+    span = (after - before) % DAY_HOURS or DAY_HOURS
+    t = ((time - before) % DAY_HOURS) / span
+    return lerp(keyframes[before], keyframes[after], t)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Optimize the gallery photos in images/gallery/ in parallel.
+
+Every photo is decoded once (EXIF orientation applied, colour converted to
+sRGB) and written metadata-free as square thumbnails for the polaroids plus a
+pyramid of responsive widths. Photographic PNGs become JPEG/WebP/AVIF; PNGs
+with few colours or real transparency stay lossless. A manifest records every
+file's dimensions and size, and the gallery references in index.html and the
+photoGallery array in js/main.js are pointed at the optimized files with
+explicit dimensions so the layout doesn't shift while they load.
+
+Photos whose bytes and settings are unchanged are skipped via the build cache.
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+
+from PIL import Image, ImageCms, ImageOps, features
+
+from build_cache import BuildCache, build_key, hash_file
+from responsive_export import EXPORT_FORMATS, EXPORT_WIDTHS, available_formats, describe
+from shared_source import run_in_pool
+
+# Bump whenever a change here alters the written files
+GALLERY_VERSION = 1
+
+GALLERY_DIR = 'images/gallery'
+OPTIMIZED_DIR = os.path.join(GALLERY_DIR, 'optimized')
+GALLERY_MANIFEST_PATH = os.path.join(OPTIMIZED_DIR, 'manifest.json')
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+
+# Polaroids show a square crop at most 280px wide: 1x and 2x thumbnails
+THUMB_SIZES = (256, 512)
+THUMB_SIZES_ATTR = '280px'
+
+# PNGs with more distinct colours than this (in a 256px preview) are photographs
+PHOTO_MIN_COLORS = 1024
+
+INDEX_PATH = 'index.html'
+SCRIPT_PATH = 'js/main.js'
+
+def slugify(filename, taken):
+    """Short, URL-safe output name for a source file, unique among taken"""
+    stem = os.path.splitext(filename)[0].lower()
+    slug = re.sub(r'[^a-z0-9]+', '-', stem).strip('-')[:32].rstrip('-') or 'photo'
+    candidate, suffix = slug, 2
+    while candidate in taken:
+        candidate, suffix = f'{slug}-{suffix}', suffix + 1
+    taken.add(candidate)
+    return candidate
+
+def list_photos(gallery_dir=GALLERY_DIR):
+    """(source path, slug) for every gallery image, in name order"""
+    taken = set()
+    photos = []
+    for filename in sorted(os.listdir(gallery_dir)):
+        path = os.path.join(gallery_dir, filename)
+        if os.path.isfile(path) and filename.lower().endswith(SOURCE_EXTENSIONS):
+            photos.append((path.replace(os.sep, '/'), slugify(filename, taken)))
+    return photos
+
+def load_photo(path):
+    """Decode a photo upright and in sRGB, dropping its metadata"""
+    with Image.open(path) as img:
+        icc = img.info.get('icc_profile')
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    transparent = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+    img = img.convert('RGBA' if transparent else 'RGB')
+    if transparent and img.getchannel('A').getextrema()[0] == 255:
+        img = img.convert('RGB')
+    if icc and features.check('littlecms2'):
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+        img = ImageCms.profileToProfile(img, source, ImageCms.createProfile('sRGB'), outputMode=img.mode)
+    img.info = {}
+    return img
+
+def is_photographic(img):
+    preview = img.convert('RGB')
+    preview.thumbnail((256, 256))
+    return preview.getcolors(PHOTO_MIN_COLORS) is None
+
+def output_formats(img, lossy):
+    """Formats to write: lossy for opaque photos, WebP and PNG for graphics and transparency"""
+    if img.mode == 'RGB' and lossy:
+        return available_formats()
+    return ['webp', 'png']
+
+def save_variant(img, path, fmt, lossy):
+    if fmt == 'png':
+        img.save(path, 'PNG', optimize=True)
+    elif fmt == 'webp' and not lossy:
+        img.save(path, 'WEBP', lossless=True, method=6)
+    else:
+        _, _, pil_format, options = EXPORT_FORMATS[fmt]
+        img.save(path, pil_format, **options)
+
+def _describe_file(path, img, fmt):
+    if fmt == 'png':
+        return {'src': path.replace(os.sep, '/'), 'format': 'png', 'type': 'image/png',
+                'width': img.width, 'height': img.height, 'bytes': os.path.getsize(path)}
+    return describe(path, img, fmt)
+
+def gallery_widths(width, widths=EXPORT_WIDTHS):
+    """Responsive widths below the photo's own, plus its full width capped at the largest"""
+    return sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+def optimize_photo(path, slug, directory=OPTIMIZED_DIR):
+    """Write one photo's thumbnails and responsive sizes; returns its manifest entry"""
+    img = load_photo(path)
+    lossy = not path.lower().endswith('.png') or is_photographic(img)
+    formats = output_formats(img, lossy)
+    ext = {fmt: EXPORT_FORMATS[fmt][0] if fmt in EXPORT_FORMATS else fmt for fmt in formats}
+    os.makedirs(directory, exist_ok=True)
+
+    # Thumbnails are never upscaled past the photo's short side
+    thumbs = []
+    for size in sorted({min(size, *img.size) for size in THUMB_SIZES}):
+        thumb = ImageOps.fit(img, (size, size), Image.LANCZOS)
+        for fmt in formats:
+            out = os.path.join(directory, f'{slug}-thumb-{size}.{ext[fmt]}')
+            save_variant(thumb, out, fmt, lossy)
+            thumbs.append(_describe_file(out, thumb, fmt))
+
+    variants = []
+    for width in gallery_widths(img.width):
+        resized = img if width == img.width else img.resize(
+            (width, round(img.height * width / img.width)), Image.LANCZOS)
+        for fmt in formats:
+            out = os.path.join(directory, f'{slug}-{width}w.{ext[fmt]}')
+            save_variant(resized, out, fmt, lossy)
+            variants.append(_describe_file(out, resized, fmt))
+
+    entry = {
+        'width': img.width,
+        'height': img.height,
+        'bytes': os.path.getsize(path),
+        'thumbs': thumbs,
+        'variants': variants,
+    }
+    thumb = _pick(thumbs, fallback_format(entry), max(THUMB_SIZES))
+    print(f"  {path}: {img.width}x{img.height} {'photo' if lossy else 'graphic'} in {len(formats)} formats, "
+          f"{entry['bytes'] / 1024:.0f} KB original -> {thumb['bytes'] / 1024:.0f} KB {thumb['width']}px thumbnail")
+    return entry
+
+def gallery_cache_key(source_hash, slug):
+    """Build-cache key for one photo: its bytes, output name and the export settings"""
+    return build_key('gallery', GALLERY_VERSION, source_hash, slug, THUMB_SIZES, EXPORT_WIDTHS,
+                     available_formats(), PHOTO_MIN_COLORS)
+
+def _pick(entries, fmt, width):
+    """The narrowest entry of format fmt at least width wide, else the widest"""
+    entries = [entry for entry in entries if entry['format'] == fmt]
+    covering = [entry for entry in entries if entry['width'] >= width]
+    return min(covering, key=lambda e: e['width']) if covering else max(entries, key=lambda e: e['width'])
+
+def fallback_format(entry):
+    """The universally supported format of a photo's files"""
+    return 'jpeg' if any(e['format'] == 'jpeg' for e in entry['thumbs']) else 'png'
+
+def primary_file(entry):
+    """The largest fallback-format thumbnail, which stands for the photo in the build cache"""
+    return _pick(entry['thumbs'], fallback_format(entry), max(THUMB_SIZES))['src']
+
+_IMG_TAG = re.compile(r'<img\b([^>]*?)\s*/?>', re.DOTALL)
+_ATTRIBUTE = re.compile(r'([\w-]+)="([^"]*)"')
+
+def rewrite_img_tags(html, manifest):
+    """
+    Point gallery <img> tags at the fallback-format thumbnails with a srcset and
+    explicit dimensions; data-original keeps the source path for later runs.
+    """
+    def rewrite(match):
+        attributes = dict(_ATTRIBUTE.findall(match.group(1)))
+        original = attributes.get('data-original', attributes.get('src'))
+        entry = manifest.get(original)
+        if entry is None:
+            return match.group(0)
+        fmt = fallback_format(entry)
+        thumbs = [thumb for thumb in entry['thumbs'] if thumb['format'] == fmt]
+        largest = max(thumbs, key=lambda thumb: thumb['width'])
+        rebuilt = {
+            'src': largest['src'],
+            'srcset': ', '.join(f"{thumb['src']} {thumb['width']}w" for thumb in thumbs),
+            'sizes': THUMB_SIZES_ATTR,
+            'width': str(largest['width']),
+            'height': str(largest['height']),
+        }
+        extra = {name: value for name, value in attributes.items() if name not in rebuilt and name != 'data-original'}
+        rebuilt.update(extra)
+        rebuilt['data-original'] = original
+        return '<img ' + ' '.join(f'{name}="{value}"' for name, value in rebuilt.items()) + '>'
+    return _IMG_TAG.sub(rewrite, html)
+
+_GALLERY_SRC = re.compile(r"src: '([^']*)'(, width: \d+, height: \d+, original: '([^']*)')?")
+
+def rewrite_photo_gallery(script, manifest):
+    """Point photoGallery entries at a 1280px fallback-format variant, with its size and the original"""
+    def rewrite(match):
+        original = match.group(3) or match.group(1)
+        entry = manifest.get(original)
+        if entry is None:
+            return match.group(0)
+        variant = _pick(entry['variants'], fallback_format(entry), 1280)
+        return (f"src: '{variant['src']}', width: {variant['width']}, height: {variant['height']}, "
+                f"original: '{original}'")
+    return _GALLERY_SRC.sub(rewrite, script)
+
+def update_references(manifest, index_path=INDEX_PATH, script_path=SCRIPT_PATH):
+    """Rewrite the gallery references in index.html and js/main.js in place"""
+    for path, rewrite in ((index_path, rewrite_img_tags), (script_path, rewrite_photo_gallery)):
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            text = f.read()
+        updated = rewrite(text, manifest)
+        if updated != text:
+            with open(path, 'w') as f:
+                f.write(updated)
+            print(f"Updated gallery references in {path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Optimize the gallery photos for the web")
+    parser.add_argument('--jobs', type=int, default=0,
+                        help="optimize photos in N worker processes (0 = one per CPU, default)")
+    parser.add_argument('--force', action='store_true',
+                        help="ignore the build cache and re-optimize every photo")
+    parser.add_argument('--no-rewrite', action='store_true',
+                        help="only write the files and manifest; leave index.html and js/main.js alone")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    photos = list_photos()
+    cache = BuildCache(force=args.force)
+
+    manifest = {}
+    if os.path.exists(GALLERY_MANIFEST_PATH):
+        with open(GALLERY_MANIFEST_PATH) as f:
+            manifest = json.load(f)['photos']
+    manifest = {path: entry for path, entry in manifest.items() if path in dict(photos)}
+
+    keys = {path: gallery_cache_key(hash_file(path), slug) for path, slug in photos}
+    stale = [(path, slug) for path, slug in photos
+             if path not in manifest or not cache.is_fresh(primary_file(manifest[path]), keys[path])]
+
+    print(f"Optimizing {len(stale)} of {len(photos)} gallery photos...")
+    results = run_in_pool(optimize_photo, stale, args.jobs) if stale else []
+    for (path, _), entry in zip(stale, results):
+        output = primary_file(entry)
+        extras = [file['src'] for file in entry['thumbs'] + entry['variants'] if file['src'] != output]
+        cache.record(output, keys[path], 'gallery', extras=extras)
+        manifest[path] = entry
+    cache.save()
+
+    os.makedirs(OPTIMIZED_DIR, exist_ok=True)
+    with open(GALLERY_MANIFEST_PATH, 'w') as f:
+        json.dump({'photos': manifest}, f, indent=2, sort_keys=True)
+        f.write('\n')
+    if not args.no_rewrite:
+        update_references(manifest)
+
+    originals = sum(entry['bytes'] for entry in manifest.values())
+    thumbs = sum(os.path.getsize(primary_file(entry)) for entry in manifest.values())
+    print(f"\n{len(photos) - len(stale)}/{len(photos)} photos up to date, {len(stale)} optimized")
+    print(f"Gallery: {len(manifest)} photos, {originals / 1024:.0f} KB of originals -> "
+          f"{thumbs / 1024:.0f} KB of polaroid thumbnails "
+          f"({1 - thumbs / originals:.0%} smaller)" if originals else "Gallery: no photos")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Bounded producer/consumer pipeline for the image generators.
+
+Each stage runs in its own thread (or several, for a stage given more workers,
+which still hands its items on in input order) and passes items to the next
+one through a queue of fixed depth, so one hour's encode overlaps the next hour's render
+even in a single process (Pillow releases the GIL in its codecs and most
+filters). At most `depth` items wait between two stages, which bounds memory,
+and every stage records how long it was busy, starved of input and blocked on
+a full output queue.
+
+Whatever a stage prints is held back and printed with its item, in input
+order, so the log reads like a serial run. print() has no per-thread stdout, so
+while any pipeline runs sys.stdout is a router that buffers the output of
+threads inside a stage call and passes every other thread's output straight
+through; it is installed once for all running pipelines and removed after the
+last, unless something else has replaced sys.stdout since. tracemalloc peaks are process-wide,
+so with memory tracing the stages are not measured individually: the pipeline
+reports one peak across all of them.
+"""
+
+from contextlib import contextmanager
+from queue import Queue, Empty, Full
+import sys
+import threading
+import time
+import tracemalloc
+
+from tracing import traced_call
+
+PIPELINE_DEPTH = 2
+
+_DONE = object()
+
+class PipelineStage:
+    """One stage: func(item) -> item for the next stage, with its timing"""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        # Workers hand items on in turn, by input index
+        self.turn = threading.Condition()
+        self.next_index = 0
+        self.running = workers
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.items = 0
+        self.records = []
+
+class _StageOutput:
+    """sys.stdout stand-in that holds each stage thread's output for the consumer to print in order"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def capture(self):
+        self.local.buffer = []
+
+    def captured(self):
+        text = ''.join(self.local.buffer)
+        self.local.buffer = None
+        return text
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            buffer.append(text)
+            return len(text)
+        with self.lock:
+            return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+# The router shared by every running pipeline, and how many are running
+_router_lock = threading.Lock()
+_router = None
+_router_users = 0
+
+@contextmanager
+def _routed_output():
+    """The _StageOutput installed as sys.stdout for the duration"""
+    global _router, _router_users
+    with _router_lock:
+        if _router_users == 0:
+            _router = sys.stdout = _StageOutput(sys.stdout)
+        _router_users += 1
+        router = _router
+    try:
+        yield router
+    finally:
+        with _router_lock:
+            _router_users -= 1
+            if _router_users == 0:
+                if sys.stdout is router:
+                    sys.stdout = router.stream
+                _router = None
+
+@contextmanager
+def discard_output():
+    """Drop whatever this thread prints inside, leaving other threads' output alone"""
+    with _routed_output() as router:
+        outer = getattr(router.local, 'buffer', None)
+        router.capture()
+        try:
+            yield
+        finally:
+            router.local.buffer = outer
+
+class Pipeline:
+    def __init__(self, stages, depth=PIPELINE_DEPTH, trace=None):
+        """
+        stages: [(name, func)] or [(name, func, workers)]; trace: traced_call
+        options to record every call, or None
+        """
+        self.stages = []
+        for name, func, *workers in stages:
+            # Profiled calls run one at a time (tracing.py): extra workers would only wait on each other
+            workers = 1 if trace and trace.get('profile') else (workers[0] if workers else 1)
+            self.stages.append(PipelineStage(name, func, workers))
+        self.depth = depth
+        self.trace = trace
+        self.wall = 0.0
+        self.memory_peak = None
+        self._stop = threading.Event()
+        self._error = None
+        self._output = None
+
+    def _put(self, queue, item, stage=None):
+        """Put with backpressure; gives up once the pipeline is stopping"""
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                break
+            except Full:
+                continue
+        if stage:
+            stage.blocked += time.perf_counter() - started
+
+    def _get(self, queue, stage=None):
+        """Next item, or _DONE once the pipeline is stopping"""
+        started = time.perf_counter()
+        item = _DONE
+        while not self._stop.is_set():
+            try:
+                item = queue.get(timeout=0.1)
+                break
+            except Empty:
+                continue
+        if stage:
+            stage.starved += time.perf_counter() - started
+        return item
+
+    def _work(self, stage, inbox, outbox):
+        printed = ''
+        try:
+            # Items travel with their input index and the output their earlier stages printed
+            while (entry := self._get(inbox, stage)) is not _DONE:
+                index, item, printed = entry
+                started = time.perf_counter()
+                record = None
+                self._output.capture()
+                try:
+                    if self.trace is None:
+                        result = stage.func(item)
+                    else:
+                        # Per-stage tracemalloc peaks would mix the concurrent stages (see run)
+                        result, record = traced_call(stage.func, item, **dict(self.trace, memory=False))
+                finally:
+                    printed += self._output.captured()
+                with stage.turn:
+                    stage.busy += time.perf_counter() - started
+                    waited = time.perf_counter()
+                    while stage.next_index != index and not self._stop.is_set():
+                        stage.turn.wait(0.1)
+                    stage.blocked += time.perf_counter() - waited
+                    if record is not None:
+                        stage.records.append(record)
+                    stage.items += 1
+                    self._put(outbox, (index, result, printed), stage)
+                    stage.next_index += 1
+                    stage.turn.notify_all()
+        except BaseException as error:
+            self._error = error
+            self._stop.set()
+            # Show what the failing item printed before the traceback
+            self._output.write(printed)
+        # The end of input reaches every worker; the last one to finish passes it on
+        self._put(inbox, _DONE)
+        with stage.turn:
+            stage.running -= 1
+            last = stage.running == 0
+        if last:
+            self._put(outbox, _DONE)
+
+    def _feed(self, items, queue):
+        for index, item in enumerate(items):
+            self._put(queue, (index, item, ''))
+        self._put(queue, _DONE)
+
+    def run(self, items):
+        """Yield the last stage's results in input order; a stage's exception is re-raised here"""
+        queues = [Queue(maxsize=self.depth) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+        threads += [threading.Thread(target=self._work, args=(stage, queues[i], queues[i + 1]), daemon=True)
+                    for i, stage in enumerate(self.stages) for _ in range(stage.workers)]
+        memory = bool(self.trace and self.trace.get('memory'))
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        with _routed_output() as self._output:
+            for thread in threads:
+                thread.start()
+            try:
+                while (entry := self._get(queues[-1])) is not _DONE:
+                    _, result, printed = entry
+                    self._output.write(printed)
+                    yield result
+            finally:
+                # Also unblocks the threads if the consumer stopped early
+                self._stop.set()
+                for thread in threads:
+                    thread.join()
+                self.wall = time.perf_counter() - started
+                if memory:
+                    self.memory_peak = tracemalloc.get_traced_memory()[1]
+        if self._error:
+            raise self._error
+
+    def item_records(self):
+        """One trace record per item, merging its records from every stage (needs trace)"""
+        merged = []
+        for records in zip(*(stage.records for stage in self.stages)):
+            slowest = max(records, key=lambda record: record['wall'])
+            merged.append({'events': [event for record in records for event in record['events']],
+                           'wall': sum(record['wall'] for record in records),
+                           'profile': slowest['profile']})
+        return merged
+
+    def summary(self):
+        """How busy each stage was over the run (blocked = waiting on a full queue downstream)"""
+        if not self.wall:
+            return "Pipeline: nothing ran"
+        stages = ', '.join(f"{stage.name}{f' x{stage.workers}' if stage.workers > 1 else ''} "
+                           f"{stage.busy / self.wall:.0%} busy"
+                           + (f" ({stage.blocked / self.wall:.0%} blocked)" if stage.blocked >= 0.01 * self.wall else '')
+                           for stage in self.stages)
+        summary = f"Pipeline (depth {self.depth}): {stages} over {self.wall:.2f} s"
+        if self.memory_peak is not None:
+            summary += f"; Python peak {self.memory_peak / 2**20:.1f} MB across all stages (pipeline-wide)"
+        return summary
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tiny low-quality image placeholders (LQIP) for the sky background.
+
+For each hour a ~20px JPEG is inlined as a base64 data URI together with the
+image's dominant colour. The compact manifest is written to
+images/sky/placeholders.json, and the hours the page has sections for
+(its data-hour attributes) are inlined into index.html, so the page can
+paint a matching background before any full-size sky image has arrived.
+
+Run directly to rebuild placeholders from the images already in images/sky/.
+"""
+
+import base64
+import io
+import json
+import os
+import re
+
+from PIL import Image
+
+PLACEHOLDER_WIDTH = 20
+PLACEHOLDERS_PATH = 'images/sky/placeholders.json'
+INDEX_PATH = 'index.html'
+SKY_DIR = 'images/sky'
+
+START_MARKER = '<!-- sky-placeholders:start -->'
+END_MARKER = '<!-- sky-placeholders:end -->'
+HOUR_PATTERN = re.compile(r'data-hour="(\d+)"')
+
+def dominant_color(img):
+    """Most common colour of the image after quantizing it to a small palette, as #rrggbb"""
+    small = img.convert('RGB')
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=8)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+def make_placeholder(img):
+    """Return {'color', 'lqip'} for an in-memory render"""
+    height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+    tiny = img.convert('RGB').resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=50, optimize=True)
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return {'color': dominant_color(img), 'lqip': f'data:image/jpeg;base64,{encoded}'}
+
+def placeholder_from_file(path):
+    """Placeholder for an image on disk, using JPEG draft mode to skip most of the decode"""
+    with Image.open(path) as img:
+        img.draft('RGB', (img.width // 8, img.height // 8))
+        return make_placeholder(img)
+
+def page_hours(html):
+    """Hour names ('05') of the sections in the page"""
+    return {f'{int(hour):02d}' for hour in HOUR_PATTERN.findall(html)}
+
+def inline_placeholders(placeholders, index_path=INDEX_PATH):
+    """Replace the JSON block between the sky-placeholders markers in index.html with the page's hours"""
+    with open(index_path) as f:
+        html = f.read()
+    if START_MARKER not in html or END_MARKER not in html:
+        print(f"  Warning: placeholder markers not found in {index_path}, skipping inline")
+        return
+    hours = page_hours(html)
+    placeholders = {name: entry for name, entry in placeholders.items() if name in hours}
+    payload = json.dumps(placeholders, sort_keys=True, separators=(',', ':'))
+    block = (f'{START_MARKER}\n'
+             f'        <script type="application/json" id="sky-placeholders">{payload}</script>\n'
+             f'        {END_MARKER}')
+    pattern = re.escape(START_MARKER) + '.*?' + re.escape(END_MARKER)
+    html = re.sub(pattern, lambda _: block, html, flags=re.DOTALL)
+    with open(index_path, 'w') as f:
+        f.write(html)
+
+def update_placeholders(rendered, sky_dir=SKY_DIR, manifest_path=PLACEHOLDERS_PATH, index_path=INDEX_PATH):
+    """
+    Merge {hour name: placeholder} for freshly rendered hours, fill in any
+    HH.jpg on disk that has no placeholder yet, then write the manifest and
+    inline it into index.html.
+    """
+    placeholders = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            placeholders = json.load(f)
+    placeholders.update(rendered)
+
+    for filename in sorted(os.listdir(sky_dir)):
+        name, ext = os.path.splitext(filename)
+        if ext == '.jpg' and re.fullmatch(r'\d\d', name) and name not in placeholders:
+            placeholders[name] = placeholder_from_file(os.path.join(sky_dir, filename))
+
+    with open(manifest_path, 'w') as f:
+        json.dump(placeholders, f, sort_keys=True, separators=(',', ':'))
+        f.write('\n')
+    inline_placeholders(placeholders, index_path)
+    return placeholders
+
+def main():
+    rendered = {}
+    for filename in sorted(os.listdir(SKY_DIR)):
+        name, ext = os.path.splitext(filename)
+        if ext == '.jpg' and re.fullmatch(r'\d\d', name):
+            rendered[name] = placeholder_from_file(os.path.join(SKY_DIR, filename))
+    placeholders = update_placeholders(rendered)
+    size = os.path.getsize(PLACEHOLDERS_PATH)
+    print(f"Wrote {len(placeholders)} placeholders to {PLACEHOLDERS_PATH} ({size} bytes) and inlined the page's hours into {INDEX_PATH}")
+
+if __name__ == '__main__':
+    main()
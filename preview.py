@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Proxy-resolution previews of a full day.
+
+The source is decoded in full and box-filtered to a fraction of its size (the
+JPEG decoder's DCT downscaling is faster but does not match a box-filtered
+final render), and the generators render every hour from that proxy with their
+pixel-sized geometry (blur radii, glow pools, sprites) scaled to match, so each
+proxy is a faithful low-resolution version of the final render. The hours are
+tiled into one labelled contact sheet to compare them at a glance.
+"""
+
+import math
+
+from PIL import Image, ImageDraw, ImageFont
+
+PREVIEW_FACTOR = 8
+SHEET_COLUMNS = 4
+SHEET_GAP = 8
+LABEL_HEIGHT = 22
+SHEET_BACKGROUND = (24, 24, 28)
+LABEL_COLOR = (235, 235, 235)
+
+def load_proxy(path, factor=PREVIEW_FACTOR):
+    """Decode path and box-filter it to 1/factor of its size; returns (proxy, full size)"""
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+    size = (max(1, round(img.width / factor)), max(1, round(img.height / factor)))
+    return img.resize(size, Image.BOX), img.size
+
+def contact_sheet(frames, columns=SHEET_COLUMNS, title=None):
+    """Tile [(label, image)] of equal size into one labelled sheet"""
+    width, height = frames[0][1].size
+    rows = math.ceil(len(frames) / columns)
+    top = LABEL_HEIGHT if title else 0
+    sheet = Image.new('RGB', (columns * (width + SHEET_GAP) + SHEET_GAP,
+                              top + rows * (height + LABEL_HEIGHT + SHEET_GAP) + SHEET_GAP), SHEET_BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default()
+    if title:
+        draw.text((SHEET_GAP, SHEET_GAP // 2 + 2), title, fill=LABEL_COLOR, font=font)
+    for index, (label, img) in enumerate(frames):
+        column, row = index % columns, index // columns
+        x = SHEET_GAP + column * (width + SHEET_GAP)
+        y = top + SHEET_GAP + row * (height + LABEL_HEIGHT + SHEET_GAP)
+        sheet.paste(img, (x, y))
+        draw.text((x, y + height + 4), label, fill=LABEL_COLOR, font=font)
+    return sheet
+
+def save_contact_sheet(frames, path, title=None, columns=SHEET_COLUMNS):
+    sheet = contact_sheet(frames, columns, title)
+    sheet.save(path, 'JPEG', quality=90)
+    print(f"Wrote {path} ({sheet.width}x{sheet.height}, {len(frames)} hours)")
+    return sheet
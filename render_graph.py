@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Render graph for batch renders that share work across hours.
+
+Each hour's pipeline is added as a chain of stage nodes keyed by the stage
+name, its parameters and the keys of its inputs, so identical stages (the
+decoded source, or a brightness pass shared by several night hours) become a
+single node. The scheduler evaluates every node at most once per batch,
+yields the outputs in the order they were added and drops each intermediate
+as soon as no pending node or output still needs it. With a checkpoint store
+(checkpoints.py), nodes of the chosen stages are restored from disk when a
+previous run saved them, skipping the stages before them. Checkpoints are keyed
+by the code of the node's stage and of every stage before it as well as their
+parameters, so editing a stage function invalidates the checkpoints after it. A
+node is only saved when recomputing it (its stage and every stage before it)
+costs more than loading it back.
+"""
+
+from collections import Counter
+import time
+
+from tracing import trace_stage
+from watcher import code_fingerprint
+
+class Node:
+    """One stage evaluation: func(*input values)"""
+
+    __slots__ = ('key', 'name', 'func', 'inputs', 'value', 'done', 'cost')
+
+    def __init__(self, key, name, func, inputs):
+        self.key = key
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.value = None
+        self.done = False
+        # Seconds this batch spent producing the value, including its inputs
+        self.cost = 0.0
+
+class RenderGraph:
+    def __init__(self, checkpoints=None):
+        self.nodes = {}
+        self.outputs = []
+        self.evaluations = 0
+        self.restored = 0
+        self.checkpoints = checkpoints
+        self.checkpoint_keys = {}
+
+    def source(self, name, value, key=None):
+        """Leaf node holding an already decoded image; key (e.g. its file hash) makes node keys stable across runs"""
+        return self.stage(name, lambda: value, params=(id(value),) if key is None else (key,))
+
+    def stage(self, name, func, *inputs, params=()):
+        """Node for func(*inputs); returns the existing node if an identical one was added before"""
+        key = (name, params, tuple(node.key for node in inputs))
+        if key not in self.nodes:
+            self.nodes[key] = Node(key, name, func, inputs)
+        return self.nodes[key]
+
+    def chain(self, node, stages):
+        """Append (name, params, func) stages after node; returns the last node"""
+        for name, params, func in stages:
+            node = self.stage(name, func, node, params=params)
+        return node
+
+    def output(self, label, node):
+        self.outputs.append((label, node))
+
+    def naive_evaluations(self):
+        """Stage evaluations of running every output's pipeline on its own"""
+        def depth(node):
+            return 1 + sum(depth(parent) for parent in node.inputs)
+        return sum(depth(node) for _, node in self.outputs)
+
+    def run(self):
+        """Yield (label, value) for each output in order, evaluating each node once"""
+        uses = Counter()
+        for node in self.nodes.values():
+            uses.update(parent.key for parent in node.inputs)
+        uses.update(node.key for _, node in self.outputs)
+        for label, node in self.outputs:
+            value = self._evaluate(node, uses)
+            self._release(node, uses)
+            yield label, value
+
+    def checkpoint_key(self, node):
+        """Node key plus the code of its stage and every stage before it"""
+        if node.key not in self.checkpoint_keys:
+            self.checkpoint_keys[node.key] = (node.key, code_fingerprint(node.func),
+                                              [self.checkpoint_key(parent) for parent in node.inputs])
+        return self.checkpoint_keys[node.key]
+
+    def _evaluate(self, node, uses):
+        if not node.done:
+            checkpointed = self.checkpoints is not None and node.name in self.checkpoints.stages
+            started = time.perf_counter()
+            if checkpointed:
+                with trace_stage('checkpoint_load', stage=node.name):
+                    node.value = self.checkpoints.load(self.checkpoint_key(node))
+            if node.value is not None:
+                self.restored += 1
+                node.cost = time.perf_counter() - started
+            else:
+                args = [self._evaluate(parent, uses) for parent in node.inputs]
+                started = time.perf_counter()
+                with trace_stage(node.name):
+                    node.value = node.func(*args)
+                self.evaluations += 1
+                node.cost = time.perf_counter() - started + sum(parent.cost for parent in node.inputs)
+                if checkpointed:
+                    with trace_stage('checkpoint_save', stage=node.name):
+                        self.checkpoints.save(self.checkpoint_key(node), node.value, cost=node.cost)
+            node.done = True
+            for parent in node.inputs:
+                self._release(parent, uses)
+        return node.value
+
+    def _release(self, node, uses):
+        """Drop a node's value once its last consumer has run"""
+        uses[node.key] -= 1
+        if uses[node.key] == 0:
+            node.value = None
+
+    def summary(self):
+        naive = self.naive_evaluations()
+        if not naive:
+            return "Render graph: nothing to render"
+        saved = naive - self.evaluations
+        restored = f", {self.restored} nodes restored from checkpoints" if self.restored else ''
+        return (f"Render graph: {self.evaluations} stage evaluations for {len(self.outputs)} outputs, "
+                f"{saved} of {naive} saved ({saved / naive:.0%}){restored}")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+On-demand local render service for previews and A/B tests of grading parameters.
+
+Serves rendered frames straight from memory using only the standard library:
+
+    GET /render?hour=17.5&w=1280&fmt=webp[&gen=restaurant|sky][&engine=array|lut][&q=85]
+    GET /metrics   cache hit rate, coalesced requests and render latency (JSON)
+
+Sources are decoded once and kept in memory. Encoded frames are kept in a
+size-bounded LRU cache, and concurrent identical requests share one render.
+Renders of one generator run one at a time (its layer and sprite caches are
+module-level), except that the slow reference engine has a lock of its own, so
+a minutes-long reference render does not hold up the fast engines.
+"""
+
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import io
+import json
+import math
+import threading
+import time
+
+from PIL import Image
+
+import generate_restaurant_variants
+import generate_sky_images
+from pipeline import discard_output
+from responsive_export import EXPORT_FORMATS
+
+SOURCES = {
+    'restaurant': 'images/sky/restaurant-with-a-view.jpg',
+    'sky': generate_sky_images.background_path,
+}
+# Largest w a request may ask for (w=0 keeps the source width)
+MAX_WIDTH = 7680
+
+class FrameCache:
+    """LRU cache of encoded frames bounded by total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = data
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+class Renderer:
+    """Decoded sources, the frame cache and single-flight coalescing of identical renders"""
+
+    def __init__(self, cache_bytes, latency_window=1000):
+        self.cache = FrameCache(cache_bytes)
+        self.sources = {}
+        self.in_flight = {}
+        self.coalesced = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.lock = threading.Lock()
+        self.source_lock = threading.Lock()
+        # The generators keep module-level layer/LUT caches, so each one renders one
+        # frame at a time; reference renders share none of them and queue separately
+        self.render_locks = {(generator, reference): threading.Lock()
+                             for generator in SOURCES for reference in (False, True)}
+
+    def get_source(self, generator):
+        with self.source_lock:
+            if generator not in self.sources:
+                if generator == 'restaurant':
+                    source = generate_restaurant_variants.load_source(SOURCES[generator])
+                else:
+                    source = Image.open(SOURCES[generator])
+                    source.load()
+                self.sources[generator] = source
+            return self.sources[generator]
+
+    def frame(self, generator, hour, width, fmt, engine, quality):
+        """Encoded frame bytes, from the cache, an identical in-flight render, or a new render"""
+        key = (generator, hour, width, fmt, engine, quality)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            data = self.render(generator, hour, width, fmt, engine, quality)
+            self.cache.put(key, data)
+            future.set_result(data)
+            return data
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def render(self, generator, hour, width, fmt, engine, quality):
+        started = time.perf_counter()
+        source = self.get_source(generator)
+        # The sky generator has no engines
+        with self.render_locks[generator, generator == 'restaurant' and engine == 'reference']:
+            if generator == 'restaurant':
+                with discard_output():
+                    img = generate_restaurant_variants.render_restaurant_variant(source, hour, engine=engine)
+            else:
+                img, _, _ = generate_sky_images.render_sky_hour(source, hour)
+        if width and width < img.width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+
+        _, _, pil_format, options = EXPORT_FORMATS[fmt]
+        options = dict(options)
+        if quality:
+            options['quality'] = quality
+        buffer = io.BytesIO()
+        img.save(buffer, pil_format, **options)
+        self.latencies.append(time.perf_counter() - started)
+        return buffer.getvalue()
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+        return {
+            'cache': self.cache.stats(),
+            'coalesced': self.coalesced,
+            'in_flight': len(self.in_flight),
+            'render_ms': {
+                'count': len(latencies),
+                'mean': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+class RenderHandler(BaseHTTPRequestHandler):
+    renderer = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/render':
+            self.handle_render(parse_qs(url.query))
+        elif url.path == '/metrics':
+            self.send(200, 'application/json', json.dumps(self.renderer.metrics(), indent=2).encode())
+        else:
+            self.send(404, 'text/plain', b'Not found\n')
+
+    def handle_render(self, query):
+        def arg(name, default=None):
+            return query.get(name, [default])[0]
+
+        try:
+            hour = float(arg('hour', '13'))
+            width = int(arg('w', '0'))
+            fmt = {'jpg': 'jpeg'}.get(arg('fmt', 'jpeg'), arg('fmt', 'jpeg'))
+            generator = arg('gen', 'restaurant')
+            engine = arg('engine', 'array')
+            quality = int(arg('q', '0'))
+        except ValueError as error:
+            self.send(400, 'text/plain', f'Bad parameter: {error}\n'.encode())
+            return
+        if not (math.isfinite(hour) and 0 <= hour < 24):
+            self.send(400, 'text/plain', b'hour must be a number in [0, 24)\n')
+            return
+        if not 0 <= width <= MAX_WIDTH:
+            self.send(400, 'text/plain', f'w must be in [0, {MAX_WIDTH}]\n'.encode())
+            return
+        if not 0 <= quality <= 100:
+            self.send(400, 'text/plain', b'q must be in [0, 100]\n')
+            return
+        if fmt not in EXPORT_FORMATS or generator not in SOURCES or engine not in ('lut', 'array', 'reference'):
+            self.send(400, 'text/plain', b'Unknown fmt, gen or engine\n')
+            return
+
+        try:
+            data = self.renderer.frame(generator, hour, width, fmt, engine, quality)
+        except FileNotFoundError as error:
+            self.send(503, 'text/plain', f'Source image missing: {error.filename}\n'.encode())
+            return
+        except Exception as error:
+            self.log_error("Render failed for %s: %r", self.path, error)
+            self.send(500, 'text/plain', f'Render failed: {error}\n'.encode())
+            return
+        self.send(200, EXPORT_FORMATS[fmt][1], data)
+
+    def send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve rendered sky frames from memory")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-mb', type=int, default=256, help="frame cache size in MB (default: 256)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    RenderHandler.renderer = Renderer(args.cache_mb * 1024 * 1024)
+    server = ThreadingHTTPServer((args.host, args.port), RenderHandler)
+    print(f"Render service on http://{args.host}:{args.port}/render?hour=17&w=1280&fmt=webp")
+    print(f"Metrics at http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
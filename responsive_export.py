@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Responsive multi-size, multi-format export for generated sky images.
+
+Each rendered hour is resized in memory to a pyramid of widths and encoded as
+JPEG, WebP and (when Pillow supports it) AVIF. A JSON manifest lists every
+variant with its dimensions and byte size so the frontend can pick the
+smallest acceptable asset for the visitor's screen and connection.
+"""
+
+import json
+import os
+
+from PIL import Image, features
+
+RESPONSIVE_DIR = 'images/sky/responsive'
+MANIFEST_PATH = os.path.join(RESPONSIVE_DIR, 'manifest.json')
+EXPORT_WIDTHS = (640, 1280, 1920)
+
+# format name -> (extension, MIME type, Pillow format, save options)
+EXPORT_FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', 'image/webp', 'WEBP', {'quality': 80, 'method': 6}),
+    'avif': ('avif', 'image/avif', 'AVIF', {'quality': 60}),
+}
+
+def available_formats():
+    """Export formats the installed Pillow can encode"""
+    formats = ['jpeg']
+    if features.check('webp'):
+        formats.append('webp')
+    if features.check('avif'):
+        formats.append('avif')
+    return formats
+
+def describe(path, img, fmt):
+    """Manifest entry for a file written from img"""
+    return {
+        'src': path.replace(os.sep, '/'),
+        'format': fmt,
+        'type': EXPORT_FORMATS[fmt][1],
+        'width': img.width,
+        'height': img.height,
+        'bytes': os.path.getsize(path),
+    }
+
+def export_responsive(img, name, widths=EXPORT_WIDTHS, formats=None, directory=RESPONSIVE_DIR):
+    """
+    Write resized variants of an in-memory render as <name>-<width>w.<ext>.
+    Widths at or above the source width are skipped (never upscaled).
+    Returns the manifest entries for the written files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for width in sorted(widths):
+        if width >= img.width:
+            continue
+        height = round(img.height * width / img.width)
+        resized = img.resize((width, height), Image.LANCZOS)
+        for fmt in formats or available_formats():
+            ext, _, pil_format, options = EXPORT_FORMATS[fmt]
+            path = os.path.join(directory, f'{name}-{width}w.{ext}')
+            resized.save(path, pil_format, **options)
+            entries.append(describe(path, resized, fmt))
+    return entries
+
+def update_manifest(hour_entries, manifest_path=MANIFEST_PATH):
+    """
+    Merge {hour name: [entries]} into the manifest. An empty list drops the
+    hour so the frontend falls back to the plain full-size JPEG; the manifest
+    is only written while some hour has responsive variants.
+    """
+    if not any(hour_entries.values()) and not os.path.exists(manifest_path):
+        return
+    manifest = {'hours': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    for name, entries in hour_entries.items():
+        if entries:
+            manifest['hours'][name] = sorted(entries, key=lambda e: (e['width'], e['bytes']))
+        else:
+            manifest['hours'].pop(name, None)
+    if not manifest['hours']:
+        os.remove(manifest_path)
+        return
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
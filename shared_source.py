@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Share a decoded source image with process-pool workers.
+
+The parent decodes the source once and copies its raw pixels into a named
+shared-memory block. Workers attach to the block by name and map an image
+straight onto it, so the image is never pickled per task, re-read from disk or
+copied into each worker.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+import atexit
+import io
+import os
+
+from PIL import Image
+
+# Pillow maps only a few raw layouts onto a buffer without copying; RGB is
+# shared in its four-bytes-per-pixel form, so workers see an RGBX image
+SHARED_MODES = {'RGB': 'RGBX'}
+
+class SharedImage:
+    """Decoded image published in shared memory for the lifetime of a batch"""
+
+    def __init__(self, img):
+        mode = SHARED_MODES.get(img.mode, img.mode)
+        data = img.tobytes('raw', mode)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        self._shm.buf[:len(data)] = data
+        self.handle = (self._shm.name, mode, img.size, len(data))
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# (segment, image) attached in this (worker) process, keyed by shared-memory
+# name; the segment stays open as long as the image maps its pixels
+_attached = {}
+
+def attach_image(handle):
+    """
+    Return the read-only image behind a SharedImage handle, attaching once per
+    process. The image is a view of the shared pixels, not a copy.
+    """
+    name, mode, size, nbytes = handle
+    if name not in _attached:
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm, Image.frombuffer(mode, size, shm.buf[:nbytes], 'raw', mode, 0, 1)
+    return _attached[name][1]
+
+@atexit.register
+def _detach_all():
+    """Drop the attached images before their segments, which cannot close while mapped"""
+    segments = [shm for shm, _ in _attached.values()]
+    _attached.clear()
+    for shm in segments:
+        try:
+            shm.close()
+        except BufferError:
+            # An image still held elsewhere maps it; the OS unmaps it at exit
+            pass
+
+def resolve_jobs(jobs):
+    """Map a --jobs value to a worker count (0 means one per CPU)"""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def _run_captured(func, args):
+    """Run func(*args) and return (result, captured stdout) so logs don't interleave"""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        result = func(*args)
+    return result, buffer.getvalue()
+
+def run_in_pool(func, tasks, jobs):
+    """
+    Run func(*task) for each task across a process pool.
+    Yields results in task order, printing each task's captured output as it is consumed.
+    """
+    with ProcessPoolExecutor(max_workers=resolve_jobs(jobs)) as pool:
+        futures = [pool.submit(_run_captured, func, task) for task in tasks]
+        for future in futures:
+            result, output = future.result()
+            print(output, end='')
+            yield result
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Packed sky atlas: every hour the page shows, in one image per tier.
+
+When a generator writes one of the page's hours it also keeps that render,
+resized to each tier, as lossless PNG in .atlas-frames/ (named by the hash of
+the JPEG written with it, so a frame is never paired with a newer JPEG). The
+atlas is pasted together from those in a single streaming pass (one frame
+alive at a time) and each tier is encoded as JPEG and WebP, so its frames go
+through one lossy encode, not a second one on top of the per-hour JPEGs. An
+hour without a kept frame (rendered before frames were kept) falls back to its
+JPEG and is reported.
+
+A manifest records every frame's position so SkyTimeLapse can fetch one asset
+instead of one request per hour and slice the frames out locally; the
+per-hour JPEGs stay in place as its fallback, and for viewports no tier
+covers. The tiers stop at 1280px frames: a 1920px tier is a single image of
+several MB that only larger screens would use, and they get the per-hour
+responsive images instead.
+
+Run directly to rebuild the atlas from the frames and images already on disk.
+"""
+
+import json
+import os
+
+from PIL import Image
+
+from build_cache import BuildCache, build_key, hash_file
+from responsive_export import EXPORT_FORMATS, describe
+
+ATLAS_DIR = 'images/sky/atlas'
+FRAMES_DIR = '.atlas-frames'
+ATLAS_MANIFEST_PATH = os.path.join(ATLAS_DIR, 'manifest.json')
+SKY_DIR = 'images/sky'
+
+# The hours SkyTimeLapse has images for
+ATLAS_HOURS = (1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23)
+ATLAS_COLUMNS = 4
+
+# tier name -> frame width; the mobile tier keeps the decoded atlas small on phones,
+# and the 1280px tier (about 1 MB as WebP) is the largest that loads quickly
+ATLAS_TIERS = {'tablet': 1280, 'mobile': 640}
+ATLAS_FORMATS = ('jpeg', 'webp')
+
+# WebP caps each side at 16383px
+WEBP_MAX_SIDE = 16383
+
+def frame_path(hour, sky_dir=SKY_DIR):
+    return os.path.join(sky_dir, f'{hour:02d}.jpg')
+
+def tier_size(size, width):
+    """Frame size of a tier for frames of the given full size"""
+    width = min(width, size[0])
+    return width, round(size[1] * width / size[0])
+
+def kept_frame_path(digest, tier, frames_dir=FRAMES_DIR):
+    return os.path.join(frames_dir, f'{digest}-{tier}.png')
+
+def keep_frame(hour, img, path, frames_dir=FRAMES_DIR):
+    """Keep a page hour's render, resized to each tier, for the atlas; path is the JPEG just written for it"""
+    if hour not in ATLAS_HOURS:
+        return
+    os.makedirs(frames_dir, exist_ok=True)
+    digest = hash_file(path)
+    # A deduplicated hour's JPEG is its canonical hour's, whose frames win
+    if all(os.path.exists(kept_frame_path(digest, tier, frames_dir)) for tier in ATLAS_TIERS):
+        return
+    for tier, width in ATLAS_TIERS.items():
+        frame = img.resize(tier_size(img.size, width), Image.LANCZOS)
+        partial = kept_frame_path(digest, tier, frames_dir) + '.partial'
+        frame.save(partial, 'PNG', compress_level=1)
+        os.replace(partial, kept_frame_path(digest, tier, frames_dir))
+
+def prune_frames(digests, frames_dir=FRAMES_DIR):
+    """Remove kept frames of JPEGs no longer on disk"""
+    if not os.path.isdir(frames_dir):
+        return
+    for name in os.listdir(frames_dir):
+        if name.rsplit('-', 1)[0] not in digests:
+            os.remove(os.path.join(frames_dir, name))
+
+def atlas_cache_key(hours=ATLAS_HOURS, sky_dir=SKY_DIR, frames_dir=FRAMES_DIR):
+    """Build-cache key of an atlas: the frame bytes (and which are kept losslessly), grid and tier layout"""
+    frames = []
+    for hour in hours:
+        digest = hash_file(frame_path(hour, sky_dir))
+        frames.append([digest, all(os.path.exists(kept_frame_path(digest, tier, frames_dir)) for tier in ATLAS_TIERS)])
+    return build_key('atlas', list(hours), frames, ATLAS_COLUMNS, ATLAS_TIERS, ATLAS_FORMATS)
+
+def build_atlas(hours=ATLAS_HOURS, sky_dir=SKY_DIR, directory=ATLAS_DIR, frames_dir=FRAMES_DIR):
+    """
+    Paste each hour's kept frames (or, without them, its resized JPEG) into one
+    grid per tier, one hour at a time, then write every tier in each format.
+    Returns the manifest.
+    """
+    with Image.open(frame_path(hours[0], sky_dir)) as first:
+        size = first.size
+    rows = -(-len(hours) // ATLAS_COLUMNS)
+    tiers = {}
+    for tier, width in ATLAS_TIERS.items():
+        frame = tier_size(size, width)
+        canvas = Image.new('RGB', (frame[0] * ATLAS_COLUMNS, frame[1] * rows))
+        tiers[tier] = {'frame': frame, 'canvas': canvas, 'frames': {}}
+
+    digests = set()
+    reencoded = []
+    for index, hour in enumerate(hours):
+        column, row = index % ATLAS_COLUMNS, index // ATLAS_COLUMNS
+        path = frame_path(hour, sky_dir)
+        digest = hash_file(path)
+        digests.add(digest)
+        kept = {name: kept_frame_path(digest, name, frames_dir) for name in tiers}
+        if all(os.path.exists(kept_path) for kept_path in kept.values()):
+            frames = {name: Image.open(kept_path) for name, kept_path in kept.items()}
+        else:
+            reencoded.append(f'{hour:02d}')
+            with Image.open(path) as img:
+                img = img.convert('RGB')
+            if img.size != size:
+                raise ValueError(f"{path} is {img.size}, expected {size} like the other frames")
+            frames = {name: img.resize(tier['frame'], Image.LANCZOS) for name, tier in tiers.items()}
+        for name, tier in tiers.items():
+            width, height = tier['frame']
+            position = (column * width, row * height)
+            with frames[name] as frame:
+                if frame.size != (width, height):
+                    raise ValueError(f"The {name} frame of {path} is {frame.size}, expected {(width, height)}")
+                tier['canvas'].paste(frame.convert('RGB'), position)
+            tier['frames'][f'{hour:02d}'] = position
+    if reencoded:
+        print(f"  No kept frames for {', '.join(reencoded)}: re-encoding their JPEGs (re-render them to avoid it)")
+    prune_frames(digests, frames_dir)
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'columns': ATLAS_COLUMNS, 'tiers': {}}
+    written = set()
+    for name, tier in tiers.items():
+        canvas = tier.pop('canvas')
+        files = []
+        for fmt in ATLAS_FORMATS:
+            ext, _, pil_format, options = EXPORT_FORMATS[fmt]
+            if fmt == 'webp' and max(canvas.size) > WEBP_MAX_SIDE:
+                continue
+            path = os.path.join(directory, f'sky-{name}.{ext}')
+            canvas.save(path, pil_format, **options)
+            files.append(describe(path, canvas, fmt))
+            written.add(os.path.basename(path))
+        tier['files'] = files
+        manifest['tiers'][name] = tier
+        print(f"  Atlas {name}: {len(hours)} frames at {tier['frame'][0]}x{tier['frame'][1]}, "
+              + ', '.join(f"{entry['format']} {entry['bytes'] / 1024:.0f} KB" for entry in files))
+
+    # Tiers or formats dropped since the last build
+    for name in os.listdir(directory):
+        if name.startswith('sky-') and name not in written:
+            os.remove(os.path.join(directory, name))
+
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
+
+def update_atlas(cache, hours=ATLAS_HOURS, sky_dir=SKY_DIR, directory=ATLAS_DIR, frames_dir=FRAMES_DIR):
+    """Rebuild the atlas if any frame changed since it was last built; returns True if rebuilt"""
+    missing = [frame_path(hour, sky_dir) for hour in hours if not os.path.exists(frame_path(hour, sky_dir))]
+    if missing:
+        print(f"  Skipping sky atlas: missing {', '.join(missing)}")
+        return False
+    manifest_path = os.path.join(directory, 'manifest.json')
+    key = atlas_cache_key(hours, sky_dir, frames_dir)
+    if cache.is_fresh(manifest_path, key):
+        print("  Sky atlas is up to date")
+        return False
+    manifest = build_atlas(hours, sky_dir, directory, frames_dir)
+    extras = [entry['src'] for tier in manifest['tiers'].values() for entry in tier['files']]
+    cache.record(manifest_path, key, 'atlas', extras=extras)
+    cache.save()
+    return True
+
+def main():
+    cache = BuildCache(force=True)
+    update_atlas(cache)
+    print(f"Wrote {ATLAS_MANIFEST_PATH}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Size-targeted JPEG/WebP encoding.
+
+Instead of a fixed quality, each image is encoded at the lowest quality whose
+decoded result still scores at least a minimum SSIM against the unencoded
+render, capped at the generator's previous fixed quality. The byte budget (the
+README asks for < 500KB per sky image) wins over the SSIM floor: an image over
+budget at every passing quality is written at the largest quality that fits,
+and its SSIM shortfall is reported. Only an image over budget even at the
+lowest quality is written over budget.
+
+Each search probes several qualities at once on a thread pool (Pillow's
+encoders and the numpy SSIM release the GIL), narrowing the range every round,
+and the generators' pipelines search PARALLEL_SEARCHES images at once.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+KB = 1024
+
+# README: optimize sky images to < 500KB each
+BYTE_BUDGET = 500 * KB
+
+# Mean SSIM (luma, 7x7 windows) an encode must keep against the unencoded render
+MIN_SSIM = 0.99
+MIN_QUALITY = 50
+SEARCH_THREADS = 4
+# Images the generators' encode stage searches at once, each probing SEARCH_THREADS qualities
+PARALLEL_SEARCHES = 2
+
+SSIM_WINDOW = 7
+
+def _window_mean(a, size=SSIM_WINDOW):
+    """Mean over every size x size window (valid region) via an integral image"""
+    c = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return (c[size:, size:] - c[:-size, size:] - c[size:, :-size] + c[:-size, :-size]) / (size * size)
+
+def luma(img):
+    return np.asarray(img.convert('L'), dtype=np.float64)
+
+def ssim(x, y):
+    """Mean structural similarity of two luma arrays (Wang et al. 2004, uniform windows)"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mx, my = _window_mean(x), _window_mean(y)
+    sxx = _window_mean(x * x) - mx * mx
+    syy = _window_mean(y * y) - my * my
+    sxy = _window_mean(x * y) - mx * my
+    index = ((2 * mx * my + c1) * (2 * sxy + c2)) / ((mx * mx + my * my + c1) * (sxx + syy + c2))
+    return float(index.mean())
+
+def encode(img, pil_format, quality, progressive=False):
+    """Encoded bytes of img at the given quality"""
+    buffer = io.BytesIO()
+    if pil_format == 'JPEG':
+        img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=progressive)
+    else:
+        img.save(buffer, pil_format, quality=quality, method=6)
+    return buffer.getvalue()
+
+def _spread(lo, hi, count):
+    """Up to count distinct qualities spread evenly over [lo, hi)"""
+    if hi - lo <= count:
+        return list(range(lo, hi))
+    step = (hi - lo) / (count + 1)
+    return sorted({lo + int(step * (i + 1)) for i in range(count)})
+
+def search_quality(img, pil_format='JPEG', max_quality=92, budget=BYTE_BUDGET, min_ssim=MIN_SSIM,
+                   progressive=False, min_quality=MIN_QUALITY, threads=SEARCH_THREADS):
+    """
+    Lowest quality in [min_quality, max_quality] whose encode keeps min_ssim,
+    or if that is over budget (bytes, or None), the largest quality under it.
+    Returns a dict with the chosen 'quality', its 'data', 'ssim' and 'bytes',
+    the 'baseline_bytes' of the fixed max_quality encode, 'within_budget' and
+    'within_ssim'.
+    """
+    reference = luma(img)
+    probes = {}
+
+    def probe(quality):
+        # Image.save keeps its options on the image, so concurrent encodes each need their own
+        data = encode(img.copy(), pil_format, quality, progressive)
+        return quality, data, ssim(reference, luma(Image.open(io.BytesIO(data))))
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # The answer lies in [lo, hi]; hi passes, or is the fixed quality we fall back to
+        lo, hi = min_quality, max_quality
+        candidates = [max_quality] + _spread(lo, hi, threads - 1)
+        while candidates:
+            for quality, data, score in pool.map(probe, candidates):
+                probes[quality] = (data, score)
+            passing = [q for q in candidates if probes[q][1] >= min_ssim and q <= hi]
+            if passing:
+                hi = min(passing)
+            failing = [q for q in candidates if q < hi and probes[q][1] < min_ssim]
+            if failing:
+                lo = max(failing) + 1
+            candidates = _spread(lo, hi, threads)
+
+        quality = hi
+        if budget is not None and len(probes[quality][0]) > budget:
+            # Sizes grow with quality: find the largest quality below it that fits,
+            # in [lo, top]; lo fits unless it is min_quality
+            def fits(q):
+                return len(probes[q][0]) <= budget
+            lo, top = min_quality, quality - 1
+            candidates = sorted({min_quality, *_spread(lo, top, threads - 1), *(q for q in probes if q < quality)})
+            while candidates:
+                for q, data, score in pool.map(probe, [q for q in candidates if q not in probes]):
+                    probes[q] = (data, score)
+                lo = max([lo] + [q for q in candidates if fits(q)])
+                top = min([top] + [q - 1 for q in candidates if not fits(q)])
+                candidates = _spread(lo + 1, top + 1, threads)
+            quality = lo
+
+    data, score = probes[quality]
+    return {
+        'quality': quality,
+        'data': data,
+        'ssim': score,
+        'bytes': len(data),
+        'baseline_bytes': len(probes[max_quality][0]),
+        'within_budget': budget is None or len(data) <= budget,
+        'within_ssim': score >= min_ssim,
+    }
+
+def save_targeted(img, path, pil_format='JPEG', max_quality=92, **options):
+    """Write img at its searched quality; returns the search result without the encoded bytes"""
+    result = search_quality(img, pil_format, max_quality, **options)
+    with open(path, 'wb') as f:
+        f.write(result.pop('data'))
+    if not result['within_budget']:
+        note = ' (OVER BUDGET)'
+    elif not result['within_ssim']:
+        note = f" (SSIM below {options.get('min_ssim', MIN_SSIM)} to fit the budget)"
+    else:
+        note = ''
+    print(f"  Encoded at quality {result['quality']} (SSIM {result['ssim']:.4f}): "
+          f"{result['bytes'] / KB:.0f} KB vs {result['baseline_bytes'] / KB:.0f} KB at {max_quality}{note}")
+    return result
+
+def summarize(results):
+    """One-line report of bytes saved across a set of save_targeted results"""
+    if not results:
+        return "Size-targeted encoding: nothing encoded"
+    baseline = sum(r['baseline_bytes'] for r in results)
+    chosen = sum(r['bytes'] for r in results)
+    over = sum(1 for r in results if not r['within_budget'])
+    shortfall = sum(1 for r in results if r['within_budget'] and not r['within_ssim'])
+    return (f"Size-targeted encoding: {len(results)} images, {chosen / KB:.0f} KB vs {baseline / KB:.0f} KB "
+            f"at fixed quality, {(baseline - chosen) / KB:.0f} KB saved ({1 - chosen / baseline:.0%}), "
+            f"{shortfall} below the SSIM floor to fit the budget, {over} over budget")
+
+def encoding_options(target_kb=None, min_ssim=MIN_SSIM, progressive=False):
+    """Encoder settings from command-line flags; None keeps the plain fixed-quality encode"""
+    if target_kb is None and not progressive:
+        return None
+    return {'budget': target_kb * KB if target_kb else None, 'min_ssim': min_ssim, 'progressive': progressive}
+
+def encode_workers(encoding):
+    """Workers for a pipeline's encode stage: several images at once when their quality is searched"""
+    return PARALLEL_SEARCHES if encoding and encoding['budget'] is not None else 1
+
+def save_encoded(img, path, quality, encoding=None):
+    """
+    Save img as JPEG at the fixed quality, or at its searched quality when
+    encoding sets a budget. Returns the search result (None for fixed quality).
+    """
+    if os.path.exists(path) and os.stat(path).st_nlink > 1:
+        # Hard-linked to deduplicated frames (frame_dedup): write a new file, not through the link
+        os.remove(path)
+    if not encoding or encoding['budget'] is None:
+        progressive = bool(encoding and encoding['progressive'])
+        img.save(path, 'JPEG', quality=quality, optimize=True, progressive=progressive)
+        return None
+    return save_targeted(img, path, 'JPEG', quality, budget=encoding['budget'],
+                         min_ssim=encoding['min_ssim'], progressive=encoding['progressive'])
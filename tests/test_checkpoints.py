@@ -0,0 +1,40 @@
+"""Checkpoints must restore unchanged stages and never a stage whose code was edited"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import generate_restaurant_variants as restaurant
+from checkpoints import CheckpointStore
+
+@pytest.fixture
+def source():
+    rng = np.random.default_rng(3)
+    return Image.fromarray(rng.integers(0, 256, (180, 320, 3), dtype=np.uint8), 'RGB')
+
+def render(source, directory, stages=('glow',)):
+    store = CheckpointStore(stages, 'test', directory=str(directory))
+    # Save every checkpoint, however cheap the tiny test image is to recompute
+    store.load_cost = lambda size, repack: 0
+    graph = restaurant.build_restaurant_graph(source, [20], checkpoints=store, source_key='source')
+    return np.asarray(dict(graph.run())[20]), graph, store
+
+def test_unchanged_stages_restore(source, tmp_path):
+    first, _, store = render(source, tmp_path)
+    assert store.saved == 1
+    again, graph, store = render(source, tmp_path)
+    assert graph.restored == 1 and store.saved == 0
+    assert np.array_equal(first, again)
+
+def test_editing_a_stage_invalidates_its_checkpoint(source, tmp_path, monkeypatch):
+    first, _, _ = render(source, tmp_path, stages=('gradient', 'glow'))
+    positions = restaurant.get_light_positions
+    monkeypatch.setattr(restaurant, 'get_light_positions',
+                        lambda width, height: [(x + 40, y) for x, y in positions(width, height)])
+    monkeypatch.setattr(restaurant, '_layer_cache', OrderedDict())
+    edited, graph, store = render(source, tmp_path, stages=('gradient', 'glow'))
+    # The gradient before the edited glow is still restored; the glow is rendered again
+    assert graph.restored == 1 and store.saved == 1
+    assert not np.array_equal(first, edited)
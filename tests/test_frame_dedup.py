@@ -0,0 +1,24 @@
+"""Night hours must collapse to one canonical frame each and be hard-linked to it"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+import generate_sky_images as sky
+from frame_dedup import FrameDeduplicator
+
+def test_night_hours_alias_and_link(tmp_path):
+    rng = np.random.default_rng(5)
+    background = tmp_path / 'background.jpg'
+    Image.fromarray(rng.integers(0, 256, (180, 320, 3), dtype=np.uint8), 'RGB').save(background)
+    directory = tmp_path / 'sky'
+    directory.mkdir()
+    dedup = FrameDeduplicator()
+    hours = [0, 1, 4, 12, 13, 20, 21, 23]
+    sky.pipeline_hours(hours, dedup=dedup, path=str(background), directory=str(directory))
+    # The moon moves between them; the sun or the stars differ everywhere else
+    assert dedup.aliases == {'01': '00', '04': '00', '23': '21'}
+    for alias, canonical in dedup.aliases.items():
+        assert os.path.samefile(directory / f'{alias}.jpg', directory / f'{canonical}.jpg')
+    assert not os.path.samefile(directory / '13.jpg', directory / '12.jpg')
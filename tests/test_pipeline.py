@@ -0,0 +1,40 @@
+"""Pipelines must keep input order (output included) and leave sys.stdout as they found it"""
+
+import io
+import sys
+import time
+
+from pipeline import Pipeline
+
+def slow_square(n):
+    # Later items finish first, so several workers complete out of order
+    time.sleep(0.01 * (5 - n % 5))
+    print(f"square {n}")
+    return n * n
+
+def test_workers_keep_input_order(capsys):
+    pipeline = Pipeline([('label', lambda n: (print(f"label {n}"), n)[1]), ('square', slow_square, 3)])
+    assert list(pipeline.run(range(10))) == [n * n for n in range(10)]
+    assert capsys.readouterr().out == ''.join(f"label {n}\nsquare {n}\n" for n in range(10))
+
+def test_stdout_is_restored(capsys):
+    before = sys.stdout
+    list(Pipeline([('square', slow_square, 2)]).run(range(3)))
+    assert sys.stdout is before
+
+def test_stdout_replaced_during_run_is_kept():
+    replacement = io.StringIO()
+    def swap(n):
+        sys.stdout = replacement
+        return n
+    before = sys.stdout
+    try:
+        list(Pipeline([('swap', swap)]).run(range(2)))
+        assert sys.stdout is replacement
+    finally:
+        sys.stdout = before
+
+def test_profiled_stages_run_together():
+    pipeline = Pipeline([('label', abs), ('square', slow_square, 2)], trace={'category': 'test', 'profile': True})
+    assert list(pipeline.run(range(4))) == [0, 1, 4, 9]
+    assert all(record['profile'] for record in pipeline.item_records())
@@ -0,0 +1,39 @@
+"""The render service must answer bad parameters with 400 and render good ones"""
+
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import render_server
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    background = tmp_path / 'background.jpg'
+    Image.new('RGB', (160, 90), (90, 120, 160)).save(background)
+    monkeypatch.setitem(render_server.SOURCES, 'sky', str(background))
+    monkeypatch.setattr(render_server.RenderHandler, 'renderer', render_server.Renderer(2**20))
+    monkeypatch.setattr(render_server.RenderHandler, 'log_message', lambda *args: None)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), render_server.RenderHandler)
+    threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+@pytest.mark.parametrize('query', ['w=-1', f'w={render_server.MAX_WIDTH + 1}', 'w=abc', 'q=-1', 'q=101',
+                                   'hour=nan', 'hour=24', 'fmt=gif'])
+def test_rejects_bad_parameters(server, query):
+    assert status(f'{server}/render?gen=sky&{query}') == 400
+
+def test_renders_good_parameters(server):
+    assert status(f'{server}/render?gen=sky&hour=21.5&w=80&q=70&fmt=jpg') == 200
@@ -0,0 +1,30 @@
+"""Cached low-resolution layers must stay within tolerance of the full-resolution reference"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import generate_restaurant_variants as restaurant
+
+# The light pools and blur radii are sized in source pixels, so the tolerance is
+# stated for photo-sized sources; half the real source's width is the smallest
+# synthetic size that renders them at full scale
+def synthetic_source(width=960, height=540):
+    """Smooth gradient with texture noise, deterministic"""
+    rng = np.random.default_rng(7)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height) + 64], axis=-1)
+    noise = rng.normal(0, 12, base.shape)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), 'RGB')
+
+@pytest.mark.parametrize('hour', [7, 13, 19, 21, 23])
+def test_layers_within_tolerance(hour):
+    for name, (max_diff, mean_diff) in restaurant.compare_layers(synthetic_source(), hour).items():
+        assert max_diff <= restaurant.LAYER_MAX_TOLERANCE, name
+        assert mean_diff <= restaurant.LAYER_MEAN_TOLERANCE, name
+
+def test_layers_at_odd_size():
+    # Sizes not divisible by LAYER_SCALE upsample from a rounded low-res layer
+    for name, (max_diff, mean_diff) in restaurant.compare_layers(synthetic_source(963, 541), 21).items():
+        assert max_diff <= restaurant.LAYER_MAX_TOLERANCE, name
+        assert mean_diff <= restaurant.LAYER_MEAN_TOLERANCE, name
@@ -0,0 +1,39 @@
+"""Fractional hours (keyframes, timelapse) must render continuous sky elements"""
+
+from PIL import Image
+
+import generate_sky_images as sky
+
+def test_late_night_is_full_night():
+    assert sky.get_star_style(23.5) == sky.get_star_style(23) == sky.get_star_style(0) == (200, 255)
+    assert sky.get_star_style(24.5) == sky.get_star_style(0.5)
+
+def test_star_style_steps_only_at_twilight_bounds():
+    night, twilight = (200, 255), (80, 100)
+    assert [sky.get_star_style(hour) for hour in (4.9, 5.0, 5.9, 6.0)] == [night, twilight, twilight, None]
+    assert [sky.get_star_style(hour) for hour in (18.0, 18.5, 20.9, 21.0)] == [None, twilight, twilight, night]
+
+def test_sunrise_and_sunset_styles_do_not_flicker():
+    assert sky.get_sun_position(5.9) is None
+    assert sky.get_sun_style(6.0) == sky.get_sun_style(6.1) == sky.get_sun_style(6.9)
+    assert sky.get_sun_style(18.0) == sky.get_sun_style(18.5) == sky.get_sun_style(18.99)
+    assert sky.get_sun_style(6.5) != sky.get_sun_style(7.0)
+
+def test_sun_radius_is_monotonic_through_the_morning():
+    radii = [sky.get_sun_style(6 + step / 10)[0] for step in range(70)]
+    assert radii == sorted(radii)
+
+def test_moon_arc_is_continuous_across_dusk():
+    assert sky.get_moon_position(18) is None
+    positions = [sky.get_moon_position(18 + step / 100) for step in range(1, 201)]
+    for x, y in positions:
+        assert 0 <= x <= 1 and 0 <= y <= 1
+    for (x0, y0), (x1, y1) in zip(positions, positions[1:]):
+        assert abs(x1 - x0) < 0.01 and abs(y1 - y0) < 0.01
+    # Whole hours keep their positions
+    assert sky.get_moon_position(19) == (0.15, 0.85)
+
+def test_fractional_hours_render():
+    source = Image.new('RGB', (160, 90), (120, 140, 160))
+    frames = sky.render_hours(source, [23.5, 5.9, 6.0, 6.1, 18.5])
+    assert all(frame.size == source.size and frame.mode == 'RGB' for frame in frames.values())
@@ -0,0 +1,37 @@
+"""The quality search must pick the lowest passing quality, and the byte budget must win over the SSIM floor"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import targeted_encoding as te
+
+@pytest.fixture(scope='module')
+def img():
+    rng = np.random.default_rng(11)
+    y, x = np.mgrid[0:240, 0:320]
+    base = np.stack([x * 255 / 320, y * 255 / 240, np.full(x.shape, 128.0)], axis=-1)
+    return Image.fromarray(np.clip(base + rng.normal(0, 20, base.shape), 0, 255).astype(np.uint8), 'RGB')
+
+def encoded_ssim(img, quality):
+    data = te.encode(img, 'JPEG', quality)
+    return te.ssim(te.luma(img), te.luma(Image.open(io.BytesIO(data)))), len(data)
+
+def test_picks_lowest_passing_quality(img):
+    result = te.search_quality(img, budget=None, min_ssim=0.97)
+    assert result['within_ssim'] and result['within_budget']
+    assert result['ssim'] >= 0.97
+    assert result['quality'] == te.MIN_QUALITY or encoded_ssim(img, result['quality'] - 1)[0] < 0.97
+
+def test_budget_wins_over_ssim_floor(img):
+    passing = te.search_quality(img, budget=None, min_ssim=0.97)
+    budget = passing['bytes'] - 1
+    result = te.search_quality(img, budget=budget, min_ssim=0.97)
+    assert result['within_budget'] and not result['within_ssim']
+    assert result['bytes'] <= budget < encoded_ssim(img, result['quality'] + 1)[1]
+
+def test_unreachable_budget_takes_lowest_quality(img):
+    result = te.search_quality(img, budget=1)
+    assert result['quality'] == te.MIN_QUALITY and not result['within_budget']
@@ -0,0 +1,35 @@
+"""Strip renders must give exactly the whole-image pixels in both generators"""
+
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import generate_restaurant_variants as restaurant
+import generate_sky_images as sky
+
+@pytest.fixture(scope='module')
+def source():
+    rng = np.random.default_rng(13)
+    return Image.fromarray(rng.integers(0, 256, (180, 320, 3), dtype=np.uint8), 'RGB')
+
+# A width that leaves a narrow last strip, and one narrower than the sky's blur halo
+STRIPS = [97, sky.BLUR_HALO - 1]
+
+@pytest.mark.parametrize('strip', STRIPS)
+@pytest.mark.parametrize('hour', [1, 6, 13, 20])
+def test_sky_strips_match_whole(source, hour, strip):
+    whole, _, _ = sky.render_sky_hour(source, hour)
+    tiled, _, _ = sky.render_sky_hour(source, hour, strip=strip)
+    assert np.array_equal(np.asarray(whole), np.asarray(tiled))
+
+@pytest.mark.parametrize('strip', STRIPS)
+@pytest.mark.parametrize('engine', ['array', 'lut'])
+@pytest.mark.parametrize('hour', [7, 13, 20])
+def test_restaurant_strips_match_whole(source, engine, hour, strip):
+    with redirect_stdout(io.StringIO()):
+        whole = restaurant.render_restaurant_variant(source, hour, engine=engine)
+        tiled = restaurant.render_restaurant_tiled(source, hour, engine=engine, strip=strip)
+    assert np.array_equal(np.asarray(whole), np.asarray(tiled))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Strip layout for bounded-memory rendering of very large sources.
+
+Images are processed as full-height column strips so that only one strip's
+intermediates are alive at a time. Strips that feed a blur are widened by a
+halo on each side and cropped back afterwards, which makes the output
+identical to a whole-image render at the seams.
+"""
+
+import math
+
+MB = 1024 * 1024
+
+# Narrowest strip worth rendering, even when the memory ceiling asks for less
+MIN_STRIP_WIDTH = 64
+
+def blur_halo(radius, passes=3):
+    """Columns a Pillow GaussianBlur(radius) reads beyond each output pixel (one box blur per pass)"""
+    return passes * (math.ceil(radius) + 1)
+
+def strip_width(width, height, max_bytes, fixed_bytes, bytes_per_pixel, halo=0):
+    """
+    Widest strip (excluding halos) whose working set fits in max_bytes once
+    fixed_bytes (source, output and shared layers) are accounted for.
+    """
+    columns = (max_bytes - fixed_bytes) // (height * bytes_per_pixel) - 2 * halo
+    if columns < MIN_STRIP_WIDTH:
+        print(f"  Warning: {max_bytes / MB:.0f} MB is below the {width}x{height} working set; "
+              f"rendering {MIN_STRIP_WIDTH}px strips")
+    return max(MIN_STRIP_WIDTH, min(width, columns))
+
+def iter_strips(width, strip, halo=0):
+    """Yield (x0, x1, halo_x0, halo_x1) column ranges covering width"""
+    for x0 in range(0, width, strip):
+        x1 = min(width, x0 + strip)
+        yield x0, x1, max(0, x0 - halo), min(width, x1 + halo)
+
+class OffsetDraw:
+    """ImageDraw proxy that takes full-image coordinates and draws them on a region whose corner is (left, top)"""
+
+    def __init__(self, draw, left, top=0):
+        self.draw = draw
+        self.left = left
+        self.top = top
+
+    def ellipse(self, xy, **kwargs):
+        x0, y0, x1, y1 = xy
+        self.draw.ellipse([x0 - self.left, y0 - self.top, x1 - self.left, y1 - self.top], **kwargs)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Continuous-time frame generation for smooth time-lapses.
+
+Frames are rendered lazily at any fractional time of day from the
+keyframe-interpolated parameter tables, so a full day at one frame per minute
+(1,440 frames) can be streamed to disk or piped to a video encoder while only
+one frame is held in memory at a time. Frame throughput is reported on stderr.
+
+Example (raw RGB frames piped to ffmpeg):
+    python3 timelapse.py --generator restaurant --frames 1440 --pipe | \\
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s 900x500 -r 30 -i - timelapse.mp4
+"""
+
+from contextlib import redirect_stdout
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+import generate_restaurant_variants
+import generate_sky_images
+
+def frame_times(frames, start=0.0, end=24.0):
+    """Evenly spaced times of day from start (inclusive) to end (exclusive)"""
+    step = (end - start) / frames
+    for index in range(frames):
+        yield start + index * step
+
+def iter_restaurant_frames(source, times, engine='array'):
+    """Yield (time, frame) for each time of day, rendering the restaurant variant lazily"""
+    for hour in times:
+        with redirect_stdout(io.StringIO()):
+            frame = generate_restaurant_variants.render_restaurant_variant(source, hour, engine=engine)
+        yield hour, frame
+
+def iter_sky_frames(base_img, times):
+    """Yield (time, frame) for each time of day, rendering the sky image lazily"""
+    for hour in times:
+        frame, _, _ = generate_sky_images.render_sky_hour(base_img, hour)
+        yield hour, frame
+
+class Throughput:
+    """Frame counter that reports frames per second at a fixed interval"""
+
+    def __init__(self, total, report_every=60, stream=sys.stderr):
+        self.total = total
+        self.report_every = report_every
+        self.stream = stream
+        self.frames = 0
+        self.started = time.perf_counter()
+
+    @property
+    def fps(self):
+        elapsed = time.perf_counter() - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def tick(self):
+        self.frames += 1
+        if self.frames % self.report_every == 0 or self.frames == self.total:
+            remaining = (self.total - self.frames) / self.fps if self.fps else 0.0
+            print(f"  {self.frames}/{self.total} frames - {self.fps:.2f} fps, "
+                  f"{1000 / self.fps:.0f} ms/frame, ~{remaining:.0f}s remaining",
+                  file=self.stream)
+
+def write_frames(frames, directory, quality=90, meter=None):
+    """Save each (time, frame) as frame_NNNNN.jpg in directory"""
+    os.makedirs(directory, exist_ok=True)
+    for index, (_, frame) in enumerate(frames):
+        frame.save(os.path.join(directory, f'frame_{index:05d}.jpg'), 'JPEG', quality=quality)
+        if meter:
+            meter.tick()
+
+def pipe_frames(frames, stream, meter=None):
+    """Write each frame as raw RGB24 bytes, e.g. for ffmpeg -f rawvideo"""
+    for _, frame in frames:
+        stream.write(frame.convert('RGB').tobytes())
+        if meter:
+            meter.tick()
+    stream.flush()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a continuous-time sky time-lapse")
+    parser.add_argument('--generator', choices=['restaurant', 'sky'], default='restaurant')
+    parser.add_argument('--frames', type=int, default=1440,
+                        help="frames across the time range (default: 1440, one per minute)")
+    parser.add_argument('--start', type=float, default=0.0, help="first hour (default: 0)")
+    parser.add_argument('--end', type=float, default=24.0, help="end hour, exclusive (default: 24)")
+    parser.add_argument('--source', help="override the generator's source image")
+    parser.add_argument('--engine', choices=['lut', 'array', 'reference'], default='array',
+                        help="restaurant colour engine (default: array)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--out', default='timelapse', help="directory for JPEG frames (default: timelapse)")
+    output.add_argument('--pipe', action='store_true', help="write raw RGB24 frames to stdout")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    times = frame_times(args.frames, args.start, args.end)
+
+    if args.generator == 'restaurant':
+        path = args.source or 'images/sky/restaurant-with-a-view.jpg'
+        source = generate_restaurant_variants.load_source(path)
+        frames = iter_restaurant_frames(source, times, engine=args.engine)
+    else:
+        path = args.source or generate_sky_images.background_path
+        source = Image.open(path)
+        source.load()
+        frames = iter_sky_frames(source, times)
+
+    print(f"Rendering {args.frames} {args.generator} frames ({source.width}x{source.height}) "
+          f"from {args.start:g}h to {args.end:g}h", file=sys.stderr)
+    meter = Throughput(args.frames)
+    if args.pipe:
+        pipe_frames(frames, sys.stdout.buffer, meter)
+    else:
+        write_frames(frames, args.out, meter=meter)
+    print(f"✓ {meter.frames} frames at {meter.fps:.2f} fps", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and memory tracing for the image generators.
+
+Pipeline code wraps each stage in trace_stage(name, hour=...). With no tracer
+active that is a no-op; inside traced_call() every stage records its wall time,
+CPU time, resident memory and (optionally) the tracemalloc peak. Events from
+serial runs and pool workers are merged into a Chrome trace-event file that can
+be opened in chrome://tracing or https://ui.perfetto.dev.
+
+Tracers are per thread, but the tracemalloc peak is process-wide: stages traced
+with memory=True in several threads at once would reset and read each other's
+peaks. Such stages take a process-wide lock, so they run one at a time; callers
+that need concurrency (pipeline.py) measure one peak over all their threads
+instead. Likewise only one cProfile profiler may be active at a time (Python
+3.12+ refuses a second), so profiled calls in concurrent threads run one at a
+time too.
+"""
+
+from contextlib import contextmanager, nullcontext
+import cProfile
+import json
+import marshal
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+_active = threading.local()
+# Held by memory-traced stages: reentrant, as stages nest within one thread
+_memory_lock = threading.RLock()
+# Held by profiled calls; a call nested in a profiled one is covered by its profiler
+_profile_lock = threading.Lock()
+
+def _current_rss():
+    """Resident set size in bytes (Linux /proc), falling back to the process high-water mark"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class Tracer:
+    """Collects one complete ('X') trace event per stage"""
+
+    def __init__(self, category='render', memory=False):
+        self.category = category
+        self.memory = memory
+        self.events = []
+
+    @contextmanager
+    def stage(self, name, **args):
+        with _memory_lock if self.memory else nullcontext():
+            if self.memory:
+                tracemalloc.reset_peak()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            try:
+                yield
+            finally:
+                wall = time.perf_counter() - wall_start
+                args = dict(args, cpu_ms=(time.process_time() - cpu_start) * 1000, rss_bytes=_current_rss())
+                if self.memory:
+                    args['py_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                self.events.append({
+                    'name': name,
+                    'cat': self.category,
+                    'ph': 'X',
+                    'ts': wall_start * 1e6,
+                    'dur': wall * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': args,
+                })
+
+@contextmanager
+def trace_stage(name, **args):
+    """Record a pipeline stage on the active tracer, if any"""
+    tracer = getattr(_active, 'tracer', None)
+    if tracer is None:
+        yield
+    else:
+        with tracer.stage(name, **args):
+            yield
+
+def traced_call(func, *args, category='render', memory=False, profile=False, **kwargs):
+    """
+    Run func(*args, **kwargs) under a fresh tracer (and cProfile when profile=True).
+    Returns (result, record) where record holds the picklable events, total wall
+    time and marshalled profile stats, so pool workers can hand them back.
+    With memory=True or profile=True, calls in concurrent threads are
+    serialized (see above).
+    """
+    tracer = Tracer(category, memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile and not getattr(_active, 'profiling', False) else None
+    _active.tracer = tracer
+    started = time.perf_counter()
+    with _profile_lock if profiler else nullcontext():
+        try:
+            if profiler:
+                _active.profiling = True
+                profiler.enable()
+            result = func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+                _active.profiling = False
+            _active.tracer = None
+    record = {'events': tracer.events, 'wall': time.perf_counter() - started, 'profile': None}
+    if profiler:
+        profiler.create_stats()
+        record['profile'] = marshal.dumps(profiler.stats)
+    return result, record
+
+class TraceCollector:
+    """Merges per-hour trace records and writes the trace, summary and slowest-hour profile"""
+
+    def __init__(self):
+        self.events = []
+        self.slowest = None
+
+    def add(self, record, label=None):
+        """Merge a traced_call record; labelled records (hours) compete for the slowest profile"""
+        self.events.extend(record['events'])
+        if label is None or record['profile'] is None:
+            return
+        if self.slowest is None or record['wall'] > self.slowest[1]['wall']:
+            self.slowest = (label, record)
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+    def write_profile(self, path):
+        """Write the slowest hour's cProfile stats (readable with pstats / snakeviz); returns its label"""
+        label, record = self.slowest
+        with open(path, 'wb') as f:
+            f.write(record['profile'])
+        return label
+
+    def summary(self):
+        """Per-stage totals: wall ms, CPU ms and the largest RSS seen"""
+        stages = {}
+        for event in self.events:
+            total = stages.setdefault(event['name'], {'count': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0, 'max_rss_mb': 0.0})
+            total['count'] += 1
+            total['wall_ms'] += event['dur'] / 1000
+            total['cpu_ms'] += event['args']['cpu_ms']
+            total['max_rss_mb'] = max(total['max_rss_mb'], event['args']['rss_bytes'] / 2**20)
+        lines = [f"  {'stage':<16}{'count':>6}{'wall ms':>11}{'cpu ms':>11}{'max RSS MB':>12}"]
+        for name, total in sorted(stages.items(), key=lambda item: -item[1]['wall_ms']):
+            lines.append(f"  {name:<16}{total['count']:>6}{total['wall_ms']:>11.1f}"
+                         f"{total['cpu_ms']:>11.1f}{total['max_rss_mb']:>12.1f}")
+        return '\n'.join(lines)
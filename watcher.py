@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Watch mode: a long-running, warm generator process.
+
+The source image and the generator module are polled for changes. An edited
+module is re-imported in place, so tweaks to its parameter tables take effect
+without restarting the interpreter, re-importing PIL or decoding the source
+again. Layer caches survive the reload when only the parameter tables changed
+(their entries are keyed by parameter values); any other edit (a function body
+or a constant) drops them and re-renders every hour. Which hours are affected
+is decided by their build-cache keys, so a single-hour tweak re-renders one
+hour.
+"""
+
+import hashlib
+import importlib
+import os
+import time
+import traceback
+import types
+
+WATCH_INTERVAL = 0.25
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _code_signature(code):
+    """Bytecode, names and constants of a code object, ignoring line numbers"""
+    consts = tuple(_code_signature(c) if isinstance(c, types.CodeType) else c for c in code.co_consts)
+    return code.co_code, code.co_names, consts
+
+def _stable(value):
+    """Value with its frozensets sorted, so its repr is the same in every process"""
+    if isinstance(value, frozenset):
+        return tuple(sorted(repr(_stable(item)) for item in value))
+    if isinstance(value, tuple):
+        return tuple(_stable(item) for item in value)
+    return value
+
+def _names(code):
+    """Global names a code object and the functions nested in it refer to"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _names(const)
+    return names
+
+def _cell_value(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        # Not assigned yet
+        return None
+
+def code_fingerprint(func):
+    """
+    Digest of func's code and of everything it reaches through its globals:
+    functions defined next to it (transitively, across this directory's
+    modules) and plain constants. Stable across processes, so it can key
+    on-disk state such as checkpoints.
+    """
+    directory = os.path.dirname(func.__code__.co_filename)
+    digest = hashlib.sha256()
+    seen = set()
+    pending = [func]
+    while pending:
+        func = pending.pop()
+        if func.__code__ in seen:
+            continue
+        seen.add(func.__code__)
+        digest.update(repr(_stable(_code_signature(func.__code__))).encode('utf-8'))
+        # Functions captured from an enclosing scope, then those named as globals
+        cells = [_cell_value(cell) for cell in func.__closure__ or ()]
+        for name in sorted(_names(func.__code__)):
+            value = func.__globals__.get(name)
+            if isinstance(value, (bool, int, float, str, tuple)):
+                digest.update(repr((name, _stable(value))).encode('utf-8'))
+            elif isinstance(value, types.FunctionType):
+                cells.append(value)
+        pending.extend(value for value in cells if isinstance(value, types.FunctionType)
+                       and os.path.dirname(value.__code__.co_filename) == directory)
+    return digest.hexdigest()
+
+def fingerprint(module, exclude=()):
+    """Signature of everything the module defines itself: function code and plain constants"""
+    signature = {}
+    for name, value in vars(module).items():
+        if name.startswith('__') or name in exclude:
+            continue
+        if isinstance(value, types.FunctionType):
+            if value.__module__ == module.__name__:
+                signature[name] = _code_signature(value.__code__)
+        elif isinstance(value, (bool, int, float, str, tuple, list, dict, type(None))):
+            signature[name] = value
+    return signature
+
+class WarmModule:
+    """A generator module that is reloaded in place, keeping its caches across table edits"""
+
+    def __init__(self, name, tables=(), caches=()):
+        self.module = importlib.import_module(name)
+        self.tables = tables
+        self.caches = caches
+        self.path = self.module.__file__
+
+    def reload(self):
+        """Re-import the module; returns True if anything besides its parameter tables changed"""
+        exclude = self.tables + self.caches
+        before = fingerprint(self.module, exclude)
+        kept = {name: getattr(self.module, name) for name in self.caches}
+        self.module = importlib.reload(self.module)
+        rebuild = fingerprint(self.module, exclude) != before
+        if not rebuild:
+            for name, cache in kept.items():
+                setattr(self.module, name, cache)
+        return rebuild
+
+def watch(warm, paths, render, interval=WATCH_INTERVAL):
+    """
+    Call render(module, changed_paths, rebuild) once up front and again whenever
+    the module file or one of paths changes; render returns the hours it wrote.
+    Errors (including a half-edited module that fails to import) are reported
+    and the watch carries on; the next edit reloads and rebuilds everything.
+    """
+    watched = [warm.path] + list(paths)
+    seen = {path: _mtime(path) for path in watched}
+    changed, rebuild = set(paths), False
+    print(f"Watching {', '.join(watched)} (Ctrl-C to stop)")
+    try:
+        while True:
+            if changed:
+                started = time.perf_counter()
+                try:
+                    if warm.path in changed:
+                        # A reload that fails part-way leaves the module half-updated: rebuild after the fix
+                        pending, rebuild = rebuild, True
+                        rebuild = warm.reload() or pending
+                    hours = render(warm.module, changed, rebuild)
+                except Exception:
+                    traceback.print_exc()
+                    print("  Render failed; waiting for the next change")
+                else:
+                    elapsed = (time.perf_counter() - started) * 1000
+                    if hours:
+                        print(f"↻ Re-rendered {len(hours)} hour(s) "
+                              f"({', '.join(f'{hour:02d}' for hour in hours)}) in {elapsed:.0f} ms")
+                    else:
+                        print(f"↻ No hours affected ({elapsed:.0f} ms)")
+                    rebuild = False
+            time.sleep(interval)
+            current = {path: _mtime(path) for path in watched}
+            changed = {path for path in watched if current[path] != seen[path] and current[path] is not None}
+            seen = current
+    except KeyboardInterrupt:
+        print("\nStopped watching")